@@ -1,12 +1,44 @@
 #!/usr/bin/env python3
-from typing import Dict, Optional, List, Union, cast
-from charms.data_platform_libs.v0.data_interfaces import DatabaseCreatedEvent
+from typing import TYPE_CHECKING, Any, Dict, Optional, List, Union, cast
 from charms.data_platform_libs.v0.data_interfaces import DatabaseRequires
+from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
+from charms.loki_k8s.v0.loki_push_api import LogProxyConsumer, LokiPushApiConsumer
+from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
 
 import ops
 import logging
-import requests
 import json
+import os
+import shlex
+import time
+
+from compute_resources import ComputeResources
+from hook_cache import HookCache
+from instrumentation import HookProfiler
+import db_endpoints
+import db_latency
+import db_pool
+import health_checks
+import instrumentation
+import load_test
+import reconcile
+import response_cache
+import rolling_restart
+import schema_migration
+import service_reload
+import status_cache
+from uvicorn_config import UvicornOptions
+import uvicorn_config
+import workload_logging
+import workload_version
+import worker_recycling
+
+if TYPE_CHECKING:
+    from charms.observability_libs.v0.kubernetes_compute_resources_patch import (
+        K8sResourcePatchFailedEvent,
+        KubernetesComputeResourcesPatch,
+    )
+    from lightkube.models.core_v1 import ResourceRequirements
 
 '''
 Log messages can be retrieved using juju debug-log
@@ -16,6 +48,10 @@ logger = logging.getLogger(__name__)
 
 PEER_NAME = 'fastapi-peer'
 
+# The hooks the pod resource patcher acts on. It pulls in lightkube and httpx, so other hooks
+# do not set it up.
+RESOURCE_PATCH_HOOKS = ('install', 'upgrade-charm', 'config-changed')
+
 JSONData = Union[
     Dict[str, 'JSONData'],
     List['JSONData'],
@@ -33,21 +69,106 @@ class FastAPIDemoCharm(ops.CharmBase):
     into events and your job is to write event handlers
     """
 
+    _stored = ops.StoredState()
+
     def __init__(self, framework: ops.Framework) -> None:
         super().__init__(framework)
+        # Off unless the `hook-profiling` option is set; see `instrumentation`.
+        self._profiler = HookProfiler(
+            enabled=cast(bool, self.config['hook-profiling']),
+            cprofile=cast(bool, self.config['hook-profiling-cprofile']),
+        )
+        # Diagnostics local to this unit; kept out of peer data so they cause no relation events.
+        self._stored.set_default(hook_profile='{}')
+        # Fingerprint of the last desired state applied to the unit; see `_reconcile`.
+        self._stored.set_default(applied_state='')
+        # Last run-load-test result, to compare the next run with.
+        self._stored.set_default(load_test='{}')
+        # Last valid resource config, so invalid config does not strip the pod of its limits;
+        # and the error of the last failed pod patch, until config changes again.
+        self._stored.set_default(compute_resources='{}', resource_patch_error='')
+        # Why the leader's last schema migration failed, and the plan this unit last warmed up.
+        self._stored.set_default(migration_error='', warmed_up='')
+        # The last schema migration this unit ran as leader, in case there is no peer relation.
+        self._stored.set_default(schema='{}')
+        # Leadership, schema key and restart grants last acted on; see `_on_peer_relation_changed`.
+        self._stored.set_default(peer_state='')
+        # Round trips to the database endpoints and the ones selected; see `_probe_db_latency`.
+        self._stored.set_default(db_latency='{}')
+        # Status of the last full evaluation, reused by update-status; see `status_cache`.
+        self._stored.set_default(status_snapshot='')
+        # Whether this dispatch may reuse that status, and whether it did.
+        self._status_reusable = False
+        self._status_reused = False
+        self._status_evaluated = False
+        # If this update-status skipped its probes, the time they last ran, which a status
+        # evaluated without them keeps.
+        self._probed_at: Optional[float] = None
         self.pebble_service_name = "fastapi-service"
         self.container = self.unit.get_container('demo-server')
         self.database = DatabaseRequires(self, relation_name="database", database_name="names_db")
+        # Optional PgBouncer-style pooler in front of PostgreSQL; preferred when related.
+        self.pooler = DatabaseRequires(self, relation_name="database-pooler", database_name="names_db")
+        # Snapshot of relation data and Pebble state, valid for this dispatch only.
+        self._cache = HookCache()
+
+        # Let Prometheus scrape the starlette-exporter /metrics endpoint on the server port
+        # (the target is refreshed when the port changes) and load the bundled alert rules.
+        self._prometheus_scraping = MetricsEndpointProvider(
+            self,
+            relation_name='metrics-endpoint',
+            jobs=[{'static_configs': [{'targets': [f"*:{self.config['server-port']}"]}]}],
+            refresh_event=self.on.config_changed,
+        )
+        # Forward the app's database interaction log file to Loki.
+        self._logging = LogProxyConsumer(
+            self, relation_name='log-proxy', log_files=self._log_files, container_name='demo-server'
+        )
+        # Loki push endpoints for Pebble to forward the service's output to (see `log-targets`).
+        self._loki = LokiPushApiConsumer(self, relation_name='logging')
+        # Ship the dashboards in src/grafana_dashboards to Grafana.
+        self._grafana_dashboards = GrafanaDashboardProvider(self, relation_name='grafana-dashboard')
+        # Patch the StatefulSet with the CPU and memory requests and limits from config. Observed
+        # before creating the patcher, so a patch failure on this config-changed is kept.
+        framework.observe(self.on.config_changed, self._on_resources_config_changed)
+        self._resources_patch = self._setup_resources_patch()
 
         # Event handlers
         framework.observe(self.on.demo_server_pebble_ready, self._on_demo_server_pebble_ready)
-        framework.observe(self.on.config_changed, self._on_config_changed)
-        framework.observe(self.database.on.database_created, self._on_database_created)
-        framework.observe(self.database.on.endpoints_changed, self._on_database_created)
+        # Everything that feeds into the desired state goes through the same reconcile path.
+        framework.observe(self.on.config_changed, self._on_reconcile)
+        framework.observe(self.database.on.database_created, self._on_reconcile)
+        framework.observe(self.database.on.endpoints_changed, self._on_endpoints_changed)
+        framework.observe(self.database.on.read_only_endpoints_changed, self._on_endpoints_changed)
+        framework.observe(self.pooler.on.database_created, self._on_reconcile)
+        framework.observe(self.pooler.on.endpoints_changed, self._on_endpoints_changed)
+        framework.observe(self.pooler.on.read_only_endpoints_changed, self._on_endpoints_changed)
+        framework.observe(self.on['database-pooler'].relation_broken, self._on_reconcile)
+        framework.observe(self.on['cache'].relation_changed, self._on_reconcile)
+        framework.observe(self.on['cache'].relation_broken, self._on_reconcile)
+        framework.observe(self.on['logs'].storage_attached, self._on_reconcile)
+        framework.observe(self.on['logs'].storage_detaching, self._on_logs_storage_detaching)
+        framework.observe(self.on[PEER_NAME].relation_joined, self._on_reconcile)
+        framework.observe(self.on[PEER_NAME].relation_departed, self._on_reconcile)
+        framework.observe(self._loki.on.loki_push_api_endpoint_joined, self._on_reconcile)
+        framework.observe(self._loki.on.loki_push_api_endpoint_departed, self._on_reconcile)
         framework.observe(self.on.collect_unit_status, self._on_collect_status)
         framework.observe(self.on.start, self._count)
+        framework.observe(self.on[PEER_NAME].relation_changed, self._on_peer_relation_changed)
+        framework.observe(self.on.leader_elected, self._on_peer_relation_changed)
+        framework.observe(self.on.update_status, self._on_update_status)
+        framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
+        framework.observe(self.on.demo_server_pebble_custom_notice, self._on_custom_notice)
+        framework.observe(self.on.demo_server_pebble_check_failed, self._on_check_failed)
+        framework.observe(self.on.demo_server_pebble_check_recovered, self._on_check_recovered)
         framework.observe(self.on.get_db_info_action, self._on_get_db_info_action)
+        framework.observe(self.on.get_hook_profile_action, self._on_get_hook_profile_action)
+        framework.observe(self.on.get_unit_stats_action, self._on_get_unit_stats_action)
+        framework.observe(self.on.run_load_test_action, self._on_run_load_test_action)
+        framework.observe(framework.on.pre_commit, self._on_pre_commit)
+        framework.observe(framework.on.commit, self._on_commit)
 
+    @instrumentation.timed
     def _on_demo_server_pebble_ready(self, event: ops.PebbleReadyEvent)  -> None:
         """
         Define and start a workload using the Pebble API.
@@ -56,9 +177,31 @@ class FastAPIDemoCharm(ops.CharmBase):
 
         Interaction with Pebble: https://juju.is/docs/sdk/pebble
         Status, SDK docs: https://juju.is/docs/sdk/status
+
+        The workload container may have been restarted with an empty plan, so the last applied
+        state cannot be trusted and everything is applied again.
         """
-        self._update_layer_and_restart
-    
+        self._reconcile(force=True)
+
+    @instrumentation.timed
+    def _on_reconcile(self, event: ops.EventBase) -> None:
+        """Config, database or peer membership changed: bring the unit to the desired state."""
+        self._reconcile()
+
+    @instrumentation.timed
+    def _on_logs_storage_detaching(self, event: ops.StorageDetachingEvent) -> None:
+        """Move the log file back to the container filesystem before the storage goes away."""
+        self._cache.invalidate('logs-storage')
+        # The storage is still listed while it detaches.
+        self._cache.get('logs-storage', lambda: False)
+        self._reconcile()
+
+    @instrumentation.timed
+    def _on_endpoints_changed(self, event: ops.EventBase) -> None:
+        """The database endpoints changed: measure them again before reconciling."""
+        self._probe_db_latency(force=True)
+        self._reconcile()
+
     @property
     def _pebble_layer(self) -> ops.pebble.Layer:
         """
@@ -66,110 +209,912 @@ class FastAPIDemoCharm(ops.CharmBase):
         Pebble layers: https://canonical-pebble.readthedocs-hosted.com/en/latest/reference/layers
         Configure Pebble leyers: https://juju.is/docs/sdk/interact-with-pebble#heading--configure-a-pebble-layer
         """
+        options = self._uvicorn_options
+        cpu_limit = self._container_cpu_limit() if options.workers is None else None
         command = ' '.join(
             [
                 'uvicorn',
                 'api_demo_server.app:app',
                 '--host=0.0.0.0',
                 f"--port={self.config['server-port']}",
+                *options.args(cpu_limit),
+                *self._logging_options.uvicorn_args(),
+                *self._drain_args,
+                *self._recycle_options.uvicorn_args(self.unit.name),
             ]
         )
+        environment = dict(self.app_environment)
+        environment.update(self._compute_resources.environment)
+        if self.config['db-change-mode'] == 'reload':
+            environment['DEMO_SERVER_SETTINGS_FILE'] = service_reload.SETTINGS_FILE
+        service: ops.pebble.ServiceDict = {
+            'override': 'replace',
+            'summary': 'fastapi demo',
+            'command': command,
+            'startup': 'enabled',
+            'environment': environment,
+            'on-check-failure': {
+                health_checks.LIVENESS_CHECK: cast(str, self.config['on-check-failure'])
+            },
+        }
+        drain_timeout = cast(int, self.config['drain-timeout'])
+        if drain_timeout:
+            # Give in-flight requests time to finish between SIGTERM and SIGKILL.
+            service['kill-delay'] = health_checks.pebble_duration(drain_timeout)
+        service.update(self._recycle_options.service_fields())
         pebble_layer: ops.pebble.LayerDict = {
             'summary': 'FastAPI demo service',
             'description': 'pebble config layer for FastAPI demo server',
-            'services': {
-                self.pebble_service_name: {
-                    'override': 'replace',
-                    'summary': 'fastapi demo',
-                    'command': command,
-                    'startup': 'enabled',
-                    'environment': self.app_environment,
-                }
-            },
+            'services': {self.pebble_service_name: service},
+            'checks': health_checks.layer_checks(
+                port=cast(int, self.config['server-port']),
+                period=cast(int, self.config['check-period']),
+                timeout=cast(int, self.config['check-timeout']),
+                threshold=cast(int, self.config['check-threshold']),
+            ),
         }
+        log_targets = self._log_targets
+        if log_targets:
+            pebble_layer['log-targets'] = log_targets
         return ops.pebble.Layer(pebble_layer)
+
+    @property
+    def _log_targets(self) -> Dict[str, ops.pebble.LogTargetDict]:
+        """Forward the service's output to every related Loki, labelled with the Juju topology."""
+        urls = [endpoint['url'] for endpoint in self._loki.loki_endpoints]
+        labels = {
+            'juju_model': self.model.name,
+            'juju_application': self.app.name,
+            'juju_unit': self.unit.name,
+        }
+        return workload_logging.log_targets(urls, [self.pebble_service_name], labels)
+
+    @property
+    def _logging_options(self) -> workload_logging.LoggingOptions:
+        """
+        Log level and destination from config; raises ValueError if they are invalid. The
+        storage is only looked up for the 'storage' destination, since this runs on every hook.
+        """
+        on_storage = self.config['log-destination'] == 'storage'
+        return workload_logging.LoggingOptions.from_config(
+            self.config, storage_attached=on_storage and self._logs_storage_attached()
+        )
+
+    def _logs_storage_attached(self) -> bool:
+        """Whether the optional `logs` storage is attached, read at most once per hook."""
+
+        def fetch() -> bool:
+            with self._profiler.measure('hook-tool.storage-list'):
+                return bool(self.model.storages['logs'])
+
+        return self._cache.get('logs-storage', fetch)
+
+    @property
+    def _cache_options(self) -> response_cache.CacheOptions:
+        """Response cache TTL, Redis limits and LRU fallback; raises ValueError if invalid."""
+        return response_cache.CacheOptions.from_config(self.config)
+
+    @property
+    def _recycle_options(self) -> worker_recycling.RecycleOptions:
+        """Worker max-requests, memory threshold and restart backoff; raises ValueError if invalid."""
+        return worker_recycling.RecycleOptions.from_config(self.config)
+
+    def _redis_url(self) -> Optional[str]:
+        """The Redis endpoint on the `cache` relation, read at most once per hook."""
+
+        def fetch() -> Optional[str]:
+            databags: List[ops.RelationDataContent] = []
+            for relation in self.model.relations['cache']:
+                if relation.app:
+                    databags.append(relation.data[relation.app])
+                databags.extend(relation.data[unit] for unit in relation.units)
+            with self._profiler.measure('hook-tool.relation-get'):
+                return response_cache.redis_url(databags)
+
+        return self._cache.get('redis', fetch)
+
+    @property
+    def _log_files(self) -> List[str]:
+        """The log file to forward through `log-proxy`, if the app writes one."""
+        try:
+            log_file = self._logging_options.log_file
+        except ValueError:
+            # Invalid config is reported by the collect-status handler.
+            log_file = workload_logging.DEFAULT_LOG_FILE
+        return [log_file] if log_file else []
+
+    @property
+    def _drain_args(self) -> List[str]:
+        """Uvicorn arguments for a graceful shutdown within the configured drain period."""
+        drain_timeout = cast(int, self.config['drain-timeout'])
+        return [f'--timeout-graceful-shutdown={drain_timeout}'] if drain_timeout else []
+
+    def _validate_config(self) -> None:
+        """Raise ValueError describing the first invalid option, other than the port."""
+        self._uvicorn_options
+        db_endpoints.order_replicas([], self.unit.name, cast(str, self.config['db-replica-selection']))
+        if self.config['db-endpoint-selection'] not in db_latency.SELECTION_MODES:
+            raise ValueError(
+                f"db-endpoint-selection must be one of {', '.join(db_latency.SELECTION_MODES)}"
+            )
+        if self.config['db-change-mode'] not in service_reload.CHANGE_MODES:
+            raise ValueError(
+                f"db-change-mode must be one of {', '.join(service_reload.CHANGE_MODES)}"
+            )
+        if cast(int, self.config['drain-timeout']) < 0:
+            raise ValueError('drain-timeout must not be negative')
+        if cast(int, self.config['max-concurrent-restarts']) < 0:
+            raise ValueError('max-concurrent-restarts must not be negative')
+        if cast(int, self.config['status-evaluation-interval']) < 0:
+            raise ValueError('status-evaluation-interval must not be negative')
+        if self.config['on-check-failure'] not in health_checks.ON_CHECK_FAILURE_ACTIONS:
+            actions = ', '.join(health_checks.ON_CHECK_FAILURE_ACTIONS)
+            raise ValueError(f'on-check-failure must be one of {actions}')
+        for key in ('check-period', 'check-timeout', 'check-threshold'):
+            if cast(int, self.config[key]) < 1:
+                raise ValueError(f'{key} must be a positive integer')
+        if cast(int, self.config['check-timeout']) >= cast(int, self.config['check-period']):
+            # Pebble rejects such a layer.
+            raise ValueError('check-timeout must be less than check-period')
+        self._compute_resources
+        self._logging_options
+        self._cache_options
+        self._recycle_options
+        shlex.split(cast(str, self.config['migration-command']))
+        if cast(int, self.config['migration-timeout']) < 1:
+            raise ValueError('migration-timeout must be a positive integer')
+        if cast(int, self.config['warmup-duration']) < 0:
+            raise ValueError('warmup-duration must not be negative')
+        if not cast(str, self.config['warmup-path']).startswith('/'):
+            raise ValueError("warmup-path must start with '/'")
+
+    @property
+    def _uvicorn_options(self) -> UvicornOptions:
+        """Worker count and server tuning from config; raises ValueError if they are invalid."""
+        return UvicornOptions.from_config(self.config)
+
+    @property
+    def _compute_resources(self) -> ComputeResources:
+        """CPU and memory requests and limits from config; raises ValueError if they are invalid."""
+        return ComputeResources.from_config(self.config)
+
+    def _setup_resources_patch(self) -> Optional['KubernetesComputeResourcesPatch']:
+        """
+        The pod resource patcher, on the hooks in `RESOURCE_PATCH_HOOKS` only (and always
+        outside of a Juju dispatch), so that other hooks do not import lightkube and httpx.
+        """
+        hook = os.path.basename(os.environ.get('JUJU_DISPATCH_PATH', ''))
+        if hook and hook not in RESOURCE_PATCH_HOOKS:
+            return None
+        from charms.observability_libs.v0.kubernetes_compute_resources_patch import (
+            KubernetesComputeResourcesPatch,
+        )
+
+        resources_patch = KubernetesComputeResourcesPatch(
+            self,
+            'demo-server',
+            resource_reqs_func=self._resource_requirements,
+            refresh_event=self.on.config_changed,
+        )
+        self.framework.observe(resources_patch.on.patch_failed, self._on_resources_patch_failed)
+        return resources_patch
+
+    def _resource_requirements(self) -> 'ResourceRequirements':
+        """
+        The container resources to patch the pod with. If the config is invalid (reported by the
+        collect-status handler), the last valid resources are kept instead.
+        """
+        from lightkube.models.core_v1 import ResourceRequirements
+
+        try:
+            resources = self._compute_resources
+        except ValueError:
+            spec = json.loads(self._stored.compute_resources)
+        else:
+            spec = {'limits': resources.limits, 'requests': resources.requests}
+            self._stored.compute_resources = json.dumps(spec)
+        return ResourceRequirements(limits=spec.get('limits', {}), requests=spec.get('requests', {}))
+
+    def _on_resources_config_changed(self, event: ops.ConfigChangedEvent) -> None:
+        """Forget an earlier patch failure; the patcher tries again with the new config."""
+        self._stored.resource_patch_error = ''
+
+    def _on_resources_patch_failed(self, event: 'K8sResourcePatchFailedEvent') -> None:
+        """Keep the failure for the collect-status handler."""
+        logger.error('Failed to patch the pod resources: %s', event.message)
+        self._stored.resource_patch_error = event.message
+
+    @property
+    def _worker_count(self) -> int:
+        """Number of uvicorn workers this unit runs, with 'auto' resolved."""
+        options = self._uvicorn_options
+        return options.worker_count(self._container_cpu_limit() if options.workers is None else None)
+
+    def _container_cpu_limit(self) -> Optional[float]:
+        """
+        The workload container's CPU limit: the configured one, which the pod gets once it is
+        patched, or else the one read from its cgroup. None if it is unlimited.
+        """
+        configured = self._compute_resources.cpu_limit_cores
+        if configured is not None:
+            return configured
+
+        def read_limit() -> Optional[float]:
+            try:
+                return uvicorn_config.parse_cpu_max(
+                    self.container.pull(uvicorn_config.CGROUP_V2_CPU_MAX).read()
+                )
+            except ops.pebble.PathError:
+                pass
+            try:
+                return uvicorn_config.parse_cfs_quota(
+                    self.container.pull(uvicorn_config.CGROUP_V1_CPU_QUOTA).read(),
+                    self.container.pull(uvicorn_config.CGROUP_V1_CPU_PERIOD).read(),
+                )
+            except ops.pebble.PathError:
+                logger.warning('Unable to read the CPU limit of the workload container')
+                return None
+
+        def fetch() -> Optional[float]:
+            with self._profiler.measure('pebble.pull'):
+                return read_limit()
+
+        return self._cache.get('cpu-limit', fetch)
     
-    def _on_config_changed(self, event: ops.ConfigChangedEvent) -> None:
-        self._handle_ports()
+    def _desired_state(self) -> reconcile.DesiredState:
+        """
+        The port and Pebble layer this unit should have, rendered at most once per dispatch.
+        Raises ValueError if the config is invalid; the collect-status handler reports why.
+        """
 
-        port = self.config['server-port']
+        def render() -> reconcile.DesiredState:
+            port = cast(int, self.config['server-port'])
+            # We need to do validation of rules here because Charm does not know which config options are changed.
+            if port == 22:
+                raise ValueError('Invalid port number, 22 is reserved for SSH')
+            self._validate_config()
+            return reconcile.DesiredState(port=port, layer=self._pebble_layer.to_dict())
 
-        # We need to do validation of rules here because Charm does not know which config options are changed.
-        if port == 22:
+        return self._cache.get('desired', render)
+
+    def _reconcile(self, force: bool = False) -> None:
+        """
+        Compute the desired state once, compare it with the last state applied and apply only
+        what differs from what Pebble reports: open port, layer, service restart and workload
+        version. Repeated or no-op events end after the fingerprint comparison; `force` skips it
+        when the observed state may have been lost.
+        """
+        try:
+            desired = self._desired_state()
+            if self._probe_db_latency():
+                # A newly probed endpoint was selected.
+                desired = self._desired_state()
+        except ValueError as e:
             # The collect-status handler will set the status to blocked.
-            logger.debug('Invalid port number, 22 is reserved for SSH')
+            logger.debug('Not reconciling: %s', e)
             return
-        
-        logger.debug("New application port is requested: %s", port)
-        self._update_layer_and_restart()
-    
-    def _handle_ports(self) -> None:
-        port = cast(int, self.config['server-port'])
-        self.unit.set_ports(port)   
-    
-    def _update_layer_and_restart(self) -> None:
+        except (ops.pebble.APIError, ops.pebble.ConnectionError):
+            logger.debug('Not reconciling: Pebble in the workload container is not ready')
+            return
+        if not force and desired.fingerprint == self._stored.applied_state:
+            logger.debug('Desired state is already applied')
+            return
+        with self._profiler.measure('hook-tool.set_ports'):
+            self.unit.set_ports(desired.port)
+        try:
+            if not self._migrate_schema(desired):
+                # Not recorded as applied; the leader publishing the revision triggers a retry.
+                return
+            self._apply_layer(desired)
+        except (ops.pebble.APIError, ops.pebble.ConnectionError):
+            # Not recorded as applied, so the next event tries again.
+            logger.debug('Pebble in the workload container is not ready')
+            return
+        except ops.pebble.PathError as e:
+            # The settings file could not be written; not recorded as applied either.
+            logger.warning('Could not write to the workload container: %s', e)
+            return
+        self._stored.applied_state = desired.fingerprint
+
+    def _schema_key(self) -> Optional[str]:
+        """
+        The migration this unit needs before it serves, or None if there is nothing to run. It
+        is keyed by the application-level data of the `database` relation, so neither the
+        endpoint this unit selected nor a pooler in between changes it.
+        """
+        command = cast(str, self.config['migration-command'])
+        if not command:
+            return None
+        for requirer in (self.database, self.pooler):
+            for data in self._relation_data(requirer).values():
+                if data:
+                    name = data.get('database') or requirer.database
+                    return schema_migration.migration_key(command, data['endpoints'], name)
+        return None
+
+    def _schema(self) -> Dict[str, Any]:
+        """The schema key and revision published by the leader, or the ones this unit reached."""
+        return self.get_peer_data('schema') or json.loads(self._stored.schema)
+
+    def _schema_pending(self) -> bool:
+        """Whether the revision published by the leader is not the one this unit needs yet."""
+        key = self._schema_key()
+        if key is None:
+            return False
+        published = self.get_peer_data('schema').get('key')
+        return key not in (published, json.loads(self._stored.schema).get('key'))
+
+    def _migrate_schema(self, desired: reconcile.DesiredState) -> bool:
+        """
+        Leader: run the migration command in the workload container, with the service's
+        environment, and publish the revision it reached. Other units only wait for that.
+        Returns whether the schema is ready for this unit to start or restart the service.
+        """
+        if not self._schema_pending():
+            # A failure of an earlier command or database no longer applies.
+            self._stored.migration_error = ''
+            return True
+        if not self.unit.is_leader():
+            self._stored.migration_error = ''
+            logger.info('Waiting for the leader to migrate the schema')
+            return False
+        command = shlex.split(cast(str, self.config['migration-command']))
+        environment = desired.services[self.pebble_service_name].get('environment', {})
+        try:
+            with self._profiler.measure('pebble.exec'):
+                process = self.container.exec(
+                    command,
+                    environment=environment,
+                    timeout=cast(int, self.config['migration-timeout']),
+                )
+                stdout, _ = process.wait_output()
+        except (ops.pebble.ExecError, ops.pebble.ChangeError, ops.pebble.TimeoutError) as e:
+            logger.error('Schema migration failed: %s', e)
+            self._stored.migration_error = str(e).splitlines()[0]
+            return False
+        revision = schema_migration.parse_revision(stdout)
+        self._stored.migration_error = ''
+        schema = {'key': self._schema_key(), 'revision': revision}
+        self._stored.schema = json.dumps(schema, sort_keys=True)
+        if self.peers:
+            self.set_peer_data('schema', schema)
+        logger.info('Migrated the schema to revision %s', revision)
+        return True
+
+    def _warm_up(self) -> None:
+        """
+        Send a short burst of requests once per (re)started service, so that its connection
+        pools and caches are filled before the unit reports Active.
+        """
+        duration = cast(int, self.config['warmup-duration'])
+        if not duration or not self._service_is_running():
+            return
+        fingerprint = workload_version.fingerprint(self._get_plan().to_dict().get('services', {}))
+        if self._stored.warmed_up == fingerprint:
+            return
+        try:
+            summary = self._run_load_test(
+                path=cast(str, self.config['warmup-path']),
+                duration=duration,
+                concurrency=self._worker_count,
+                rate=0,
+            )
+        except (ops.pebble.Error, ValueError) as e:
+            logger.info('Warm-up failed, retrying later: %s', e)
+            return
+        if not schema_migration.warmed_up(summary):
+            logger.info('Workload is not answering yet, warm-up deferred')
+            return
+        self._stored.warmed_up = fingerprint
+        logger.info('Warmed up the workload with %s requests', summary['requests'])
+
+    def _warm_up_pending(self) -> bool:
+        """Whether warm-up is enabled and the running service has not been warmed up yet."""
+        if not self.config['warmup-duration']:
+            return False
+        fingerprint = workload_version.fingerprint(self._get_plan().to_dict().get('services', {}))
+        return self._stored.warmed_up != fingerprint
+
+    def _apply_layer(self, desired: reconcile.DesiredState) -> None:
         """
-        This method will get the current Pebble layer configuration and compare the new and 
-        the existing service definitions, if they differ, it will update the layer and restart the service.
+        Compare the desired service definitions with the current Pebble plan, and if they differ
+        update the layer and restart the service. Changes to health checks only update the layer,
+        as Pebble applies them without a restart. If only database settings changed and
+        `db-change-mode` is 'reload', the service is reloaded gracefully instead (see
+        `_reload_service`).
 
         You'll need to specify the right entrypoint and environment
         configuration for your specific workload. Tip: you can see the
         standard entrypoint of an existing container using docker inspect
         """
+        # Get the current pebble layer config
+        plan = self._get_plan().to_dict()
+        services = plan.get('services', {})
+        current_targets = plan.get('log-targets', {})
+        stale_targets = workload_logging.stale_log_targets(current_targets, desired.log_targets)
+        if (
+            services != desired.services
+            or not health_checks.checks_match(plan.get('checks', {}), desired.checks)
+            or not health_checks.checks_match(current_targets, desired.log_targets)
+            or stale_targets
+        ):
+            # Changes were made, add the new layer
+            layer = dict(desired.layer)
+            if stale_targets:
+                layer['log-targets'] = {**desired.log_targets, **stale_targets}
+            with self._profiler.measure('pebble.add_layer'):
+                self.container.add_layer('fastapi_demo', ops.pebble.Layer(layer), combine=True)
+            self._cache.invalidate('plan', 'service', 'checks')
+            logger.info("Added updated layer 'fastapi_demo' to Pebble plan")
 
-        self.unit.status = ops.MaintenanceStatus('Assembling Pebble layers')
-        try:
-            # Get the current pebble layer config
-            services = self.container.get_plan().to_dict().get('services', {})
-            if services != self._pebble_layer.to_dict().get('services', {}):
-                # Changes were made, add the new layer
-                self.container.add_layer('fastapi_demo', self._pebble_layer, combine=True)
-                logger.info("Added updated layer 'fastapi_demo' to Pebble plan")
-        
-                self.container.restart(self.pebble_service_name)
-                logger.info(f"Restarted '{self.pebble_service_name}' service")
-        
-            self.unit.set_workload_version(self.version)
-            self.unit.status = ops.ActiveStatus()
-        except ops.pebble.APIError:
-            self.unit.status = ops.MaintenanceStatus('Waiting for Pebble in workload container')
+        if services != desired.services:
+            current_service = services.get(self.pebble_service_name, {})
+            desired_service = desired.services[self.pebble_service_name]
+            if self.config['db-change-mode'] == 'reload':
+                self._push_settings(desired_service.get('environment', {}))
+            if self._can_reload(current_service, desired_service):
+                self._reload_service()
+            elif self._rolling_restart_enabled():
+                # The restart, and the version probe after it, happen when the lock is granted.
+                self._request_restart_lock()
+                return
+            else:
+                self._restart_service()
+
+        self._update_workload_version(probe=not self.config['defer-version-probe'])
+        self._warm_up()
+
+    def _can_reload(self, current: Dict[str, Any], desired: Dict[str, Any]) -> bool:
+        """
+        Reload instead of restarting when enabled, when only database settings changed and when
+        uvicorn runs a supervisor (more than one worker) that can replace workers one by one.
+        """
+        return (
+            self.config['db-change-mode'] == 'reload'
+            and self._worker_count > 1
+            and self._service_is_running()
+            and service_reload.can_reload(current, desired)
+        )
+
+    def _push_settings(self, environment: Dict[str, Optional[str]]) -> None:
+        """Write the reloadable database settings where the workload re-reads them."""
+        with self._profiler.measure('pebble.push'):
+            self.container.push(
+                service_reload.SETTINGS_FILE,
+                service_reload.render_settings(environment),
+                make_dirs=True,
+                permissions=0o600,
+            )
+
+    def _reload_service(self) -> None:
+        """
+        Ask uvicorn's supervisor to replace its workers one at a time (SIGHUP). The layer is
+        already updated, so a later restart uses the same settings as the reloaded workers.
+        """
+        with self._profiler.measure('pebble.send_signal'):
+            self.container.send_signal('SIGHUP', self.pebble_service_name)
+        logger.info(f"Reloaded the workers of the '{self.pebble_service_name}' service")
+
+    def _restart_service(self) -> None:
+        """Restart the FastAPI service right away."""
+        with self._profiler.measure('pebble.restart'):
+            self.container.restart(self.pebble_service_name)
+        self._cache.invalidate('service')
+        logger.info(f"Restarted '{self.pebble_service_name}' service")
 
+    def _rolling_restart_enabled(self) -> bool:
+        """Coordinate restarts only if other units are serving and this unit is serving too."""
+        return bool(
+            self.peers
+            and self.peers.units
+            and cast(int, self.config['max-concurrent-restarts']) > 0
+            and self._service_is_running()
+        )
+
+    def _request_restart_lock(self) -> None:
+        """
+        Queue this unit for a rolling restart. The new layer is already in the plan, so the
+        restart picks it up whenever the leader grants the lock.
+        """
+        if self.get_peer_data('restart', self.unit).get('state') != rolling_restart.REQUESTED:
+            self.set_peer_data('restart', {'state': rolling_restart.REQUESTED}, self.unit)
+            logger.info('Requested a rolling restart lock')
+        if self.unit.is_leader():
+            # The leader does not get relation-changed for its own data.
+            self._grant_restart_locks()
+
+    def _restart_requests(self) -> Dict[str, str]:
+        """Rolling restart state of every unit that has requested or holds a lock."""
+        peers = cast(ops.Relation, self.peers)
+        requests = {}
+        for unit in (self.unit, *peers.units):
+            state = self.get_peer_data('restart', unit).get('state')
+            if state:
+                requests[unit.name] = cast(str, state)
+        return requests
+
+    def _grant_restart_locks(self) -> None:
+        """Leader only: hand out restart locks, at most `max-concurrent-restarts` at a time."""
+        granted = cast(List[str], self.get_peer_data('restart_grants').get('units', []))
+        grants = rolling_restart.grant(
+            self._restart_requests(), granted, cast(int, self.config['max-concurrent-restarts'])
+        )
+        if grants != granted:
+            self.set_peer_data('restart_grants', {'units': grants})
+            logger.info('Rolling restart locks held by: %s', ', '.join(grants) or 'none')
+        if self.unit.name in grants:
+            self._process_restart_lock()
+
+    def _process_restart_lock(self) -> None:
+        """
+        Restart once this unit holds a lock, and release the lock only when the workload answers
+        again. If it is not healthy yet, the check is repeated on update-status or the ready
+        notice, and the lock stays held so no other unit goes down meanwhile.
+        """
+        state = self.get_peer_data('restart', self.unit).get('state')
+        granted = cast(List[str], self.get_peer_data('restart_grants').get('units', []))
+        if not state or self.unit.name not in granted or not self.container.can_connect():
+            return
+        if state == rolling_restart.REQUESTED:
+            self._restart_service()
+            self.set_peer_data('restart', {'state': rolling_restart.RESTARTED}, self.unit)
+        if not self.version:
+            logger.info('Holding the restart lock until the workload is healthy')
+            return
+        self.set_peer_data('restart', {}, self.unit)
+        logger.info('Released the rolling restart lock')
+        self._update_workload_version(probe=True)
+        self._warm_up()
+        if self.unit.is_leader():
+            self._grant_restart_locks()
+
+    @instrumentation.timed
+    def _on_peer_relation_changed(self, event: ops.EventBase) -> None:
+        """
+        Grant restart locks (leader) and act on a lock granted to this unit. A schema revision
+        published by the leader may also be what this unit waits for before it starts.
+        """
+        if not self.peers:
+            return
+        if self.unit.is_leader():
+            self._grant_restart_locks()
+        else:
+            self._process_restart_lock()
+        # Other peer data (start counters, versions, recycles) does not change the desired state.
+        peer_state = json.dumps(
+            {
+                'leader': self.unit.is_leader(),
+                'schema': self.get_peer_data('schema').get('key'),
+                'grants': self.get_peer_data('restart_grants').get('units', []),
+            },
+            sort_keys=True,
+        )
+        if peer_state != self._stored.peer_state:
+            self._stored.peer_state = peer_state
+            self._reconcile()
+
+    @instrumentation.timed
     def _on_collect_status(self, event: ops.CollectStatusEvent) -> None:
+        if self._status_reusable and self._reuse_status(event):
+            return
+        self._status_evaluated = True
         port = self.config['server-port']
         
         if port == 22:
             event.add_status(ops.BlockedStatus('Invalid port number, 22 is reserved for SSH'))
+
+        try:
+            self._validate_config()
+        except ValueError as e:
+            event.add_status(ops.BlockedStatus(f'Invalid config: {e}'))
+
+        if self._stored.migration_error and self.unit.is_leader() and self._schema_pending():
+            event.add_status(ops.BlockedStatus(f'Schema migration failed: {self._stored.migration_error}'))
+        elif self._schema_pending():
+            event.add_status(ops.WaitingStatus('Waiting for the leader to migrate the schema'))
+
+        if self._stored.resource_patch_error:
+            event.add_status(
+                ops.BlockedStatus(f'Failed to apply resource limits: {self._stored.resource_patch_error}')
+            )
         
-        if not self.model.get_relation('database'):
+        if not self.model.get_relation('database') and not self.model.get_relation('database-pooler'):
             # We need the user to do 'juju integrate'.
             event.add_status(ops.BlockedStatus('Waiting for database relation'))
         
-        elif not self.database.fetch_relation_data():
+        elif not self.fetch_postgres_relation_data():
             # We need the charms to finish integrating.
             event.add_status(ops.WaitingStatus('Waiting for database relation'))
         
         try:
-            status = self.container.get_service(self.pebble_service_name)
-        except (ops.pebble.APIError, ops.ModelError):
+            status = self._get_service()
+            checks = self._get_checks()
+        except (ops.pebble.APIError, ops.pebble.ConnectionError, ops.ModelError):
             event.add_status(ops.MaintenanceStatus('Waiting for Pebble in workload container'))
         else:
             if not status.is_running():
                 event.add_status(ops.MaintenanceStatus('Waiting for the service to start up'))
+            elif self._check_is_down(checks, health_checks.LIVENESS_CHECK):
+                event.add_status(ops.MaintenanceStatus('Workload is not accepting connections'))
+            elif self._check_is_down(checks, health_checks.READINESS_CHECK):
+                event.add_status(ops.WaitingStatus('Waiting for the workload to become ready'))
+            elif self._warm_up_pending():
+                event.add_status(ops.WaitingStatus('Warming up the workload'))
         
+        restart_state = self.get_peer_data('restart', self.unit).get('state')
+        if restart_state == rolling_restart.REQUESTED:
+            event.add_status(ops.WaitingStatus('Waiting for rolling restart lock'))
+        elif restart_state == rolling_restart.RESTARTED:
+            event.add_status(ops.MaintenanceStatus('Rolling restart: waiting for workload to answer'))
+        if self.unit.is_leader() and self.peers:
+            pending = len(self._restart_requests())
+            if pending:
+                event.add_status(ops.ActiveStatus(f'Rolling restart: {pending} unit(s) pending'))
+
+        recycles = worker_recycling.describe(self.get_peer_data('recycles', self.unit))
+        if recycles:
+            event.add_status(ops.ActiveStatus(recycles))
+
         event.add_status(ops.ActiveStatus())
         
+    def _status_fingerprint(self) -> str:
+        """
+        Fingerprint of the status inputs that are cheap to read; see `status_cache`. Raises
+        Pebble errors if the checks cannot be read.
+        """
+        checks = self._get_checks()
+        return status_cache.fingerprint(
+            {
+                'config': dict(self.config),
+                'stored': [
+                    self._stored.applied_state,
+                    self._stored.warmed_up,
+                    self._stored.migration_error,
+                    self._stored.resource_patch_error,
+                ],
+                'unit': {key: self.get_peer_data(key, self.unit) for key in ('restart', 'recycles')},
+                'checks': {name: info.status for name, info in checks.items()},
+            }
+        )
+
+    def _status_fresh(self) -> bool:
+        """Whether the last full status evaluation is within `status-evaluation-interval`."""
+        snapshot = status_cache.StatusSnapshot.from_json(self._stored.status_snapshot)
+        interval = cast(int, self.config['status-evaluation-interval'])
+        if not snapshot or not snapshot.fresh(time.time(), interval):
+            return False
+        self._probed_at = snapshot.evaluated_at
+        return True
+
+    def _reuse_status(self, event: ops.CollectStatusEvent) -> bool:
+        """Report the last evaluated status again if nothing it depends on changed."""
+        snapshot = status_cache.StatusSnapshot.from_json(self._stored.status_snapshot)
+        interval = cast(int, self.config['status-evaluation-interval'])
+        if not snapshot or interval <= 0:
+            return False
+        try:
+            fingerprint = self._status_fingerprint()
+        except (ops.pebble.APIError, ops.pebble.ConnectionError, ops.ModelError):
+            return False
+        if not snapshot.reusable(fingerprint, time.time(), interval):
+            return False
+        event.add_status(ops.StatusBase.from_name(snapshot.name, snapshot.message))
+        self._status_reused = True
+        return True
+
+    def _record_status(self) -> None:
+        """
+        Keep the status of a full evaluation on update-status for the next one to reuse. Any
+        other dispatch may have changed an input, so it only drops the snapshot.
+        """
+        if not self._status_reusable:
+            if self._stored.status_snapshot:
+                self._stored.status_snapshot = ''
+            return
+        if self._status_reused or not self._status_evaluated:
+            return
+        status = self.unit.status
+        snapshot = ''
+        if isinstance(status, ops.ActiveStatus):
+            try:
+                snapshot = status_cache.StatusSnapshot(
+                    name=status.name,
+                    message=status.message,
+                    fingerprint=self._status_fingerprint(),
+                    evaluated_at=self._probed_at or time.time(),
+                ).to_json()
+            except (ops.pebble.APIError, ops.pebble.ConnectionError, ops.ModelError):
+                pass
+        self._stored.status_snapshot = snapshot
+
     @property
     def version(self) -> str:
+        """The version reported by the workload, or an empty string if it is not answering yet."""
+        probe = workload_version.VersionProbe(
+            cast(int, self.config['server-port']), is_ready=self._service_is_running
+        )
         try:
-            if self.container.get_services(self.pebble_service_name):
-                return self._request_version()
+            with self._profiler.measure('http.version'):
+                return probe.probe() or ""
         except Exception as e:
             logger.warning("unable to get version from API: %s", str(e), exc_info=True)
         return ""
 
-    def _request_version(self) -> str:
-        resp = requests.get(f"http://localhost:{self.config['server-port']}/version", timeout=10)
-        return resp.json()["version"]
+    def _service_is_running(self) -> bool:
+        """Ask Pebble directly (bypassing the cache) whether the FastAPI service is running."""
+        try:
+            with self._profiler.measure('pebble.get_service'):
+                return self.container.get_service(self.pebble_service_name).is_running()
+        except (ops.pebble.APIError, ops.pebble.ConnectionError, ops.ModelError):
+            return False
+
+    def _update_workload_version(self, probe: bool) -> None:
+        """
+        Set the workload version, asking the API only if the Pebble plan changed since the last
+        successful probe. The last known version is kept in this unit's peer data bucket, so
+        no-op hooks do not make any HTTP request. With `probe` False (or if the workload is not
+        answering yet) the request is left for the next update-status or ready notice.
+        """
+        if self.get_peer_data('restart', self.unit).get('state'):
+            # A rolling restart is pending, so the running process still has the old plan.
+            return
+        fingerprint = workload_version.fingerprint(self._get_plan().to_dict().get('services', {}))
+        cached = self.get_peer_data('workload_version', self.unit)
+        if cached.get('fingerprint') == fingerprint:
+            return
+        if not probe:
+            logger.debug('Workload version probe deferred')
+            return
+        version = self.version
+        if not version:
+            logger.info('Workload is not answering yet, version probe deferred')
+            return
+        with self._profiler.measure('hook-tool.application-version-set'):
+            self.unit.set_workload_version(version)
+        if self.peers:
+            self.set_peer_data(
+                'workload_version', {'version': version, 'fingerprint': fingerprint}, self.unit
+            )
+
+    @instrumentation.timed
+    def _on_update_status(self, event: ops.UpdateStatusEvent) -> None:
+        """
+        Pick up a workload version or a restart lock release left over from an earlier hook,
+        recycle the workers if they use too much memory and re-evaluate the database endpoints.
+        The version probe and warm-up wait for the next full status evaluation while the last one
+        is fresh, and the unit status is reused if nothing changed (see `status_cache`).
+        """
+        self._status_reusable = True
+        if not self.container.can_connect():
+            return
+        self._process_restart_lock()
+        self._check_memory()
+        if self._probe_db_latency(force=True):
+            self._reconcile()
+        if self._status_fresh():
+            return
+        self._update_workload_version(probe=True)
+        self._warm_up()
+
+    def _container_rss(self) -> Optional[int]:
+        """Resident memory of the workload container in bytes, from its cgroup statistics."""
+        for path in (worker_recycling.CGROUP_V2_MEMORY_STAT, worker_recycling.CGROUP_V1_MEMORY_STAT):
+            try:
+                with self._profiler.measure('pebble.pull'):
+                    return worker_recycling.parse_memory_stat(self.container.pull(path).read())
+            except (ops.pebble.PathError, ops.pebble.APIError):
+                continue
+        return None
+
+    def _check_memory(self) -> None:
+        """
+        Recycle the workers before the container reaches its memory limit and is OOM-killed:
+        SIGHUP lets uvicorn's supervisor replace its workers one by one, while a single worker
+        is restarted, through a rolling restart lock if other units are serving. Recycles are
+        counted in this unit's peer bucket and shown in the unit status.
+        """
+        try:
+            self._validate_config()
+            options = self._recycle_options
+        except ValueError:
+            # Invalid config is reported by the collect-status handler.
+            return
+        if not options.memory_threshold_mb or not self._service_is_running():
+            return
+        try:
+            rss = self._container_rss()
+            if not options.over_threshold(rss):
+                return
+            logger.warning(
+                'Workload memory %d MiB is over %d MiB, recycling workers',
+                cast(int, rss) // 2**20,
+                options.memory_threshold_mb,
+            )
+            if self._worker_count > 1:
+                self._reload_service()
+            elif self._rolling_restart_enabled():
+                self._request_restart_lock()
+            else:
+                self._restart_service()
+        except (ops.pebble.APIError, ops.pebble.ConnectionError) as e:
+            logger.warning('Memory check failed, retrying on the next update-status: %s', e)
+            return
+        if self.peers:
+            count = cast(int, self.get_peer_data('recycles', self.unit).get('count', 0))
+            self.set_peer_data('recycles', {'count': count + 1, 'last_rss': rss}, self.unit)
+
+    @instrumentation.timed
+    def _on_custom_notice(self, event: ops.PebbleCustomNoticeEvent) -> None:
+        """Probe the version as soon as the workload announces it is ready to serve."""
+        if event.notice.key == workload_version.READY_NOTICE:
+            self._process_restart_lock()
+            self._update_workload_version(probe=True)
+            self._warm_up()
+
+    @instrumentation.timed
+    def _on_check_failed(self, event: ops.PebbleCheckFailedEvent) -> None:
+        """Log the failure; the unit status is derived from check state in collect-status."""
+        logger.warning("Pebble check '%s' failed", event.info.name)
+
+    @instrumentation.timed
+    def _on_check_recovered(self, event: ops.PebbleCheckRecoveredEvent) -> None:
+        """The workload serves again, which may be what a held restart lock is waiting for."""
+        logger.info("Pebble check '%s' recovered", event.info.name)
+        if event.info.name == health_checks.READINESS_CHECK:
+            self._process_restart_lock()
+            self._warm_up()
+
+    @instrumentation.timed
+    def _on_upgrade_charm(self, event: ops.UpgradeCharmEvent) -> None:
+        """
+        A refresh may come with a new OCI image, so forget the cached workload version. Also drop
+        the application-wide 'unit_stats' counter that older revisions kept in the app bucket.
+        """
+        if self.peers:
+            self.set_peer_data('workload_version', {}, self.unit)
+            if self.unit.is_leader() and 'unit_stats' in self.peers.data[self.app]:
+                del self.peers.data[self.app]['unit_stats']
+
+    def _relation_data(self, requirer: DatabaseRequires) -> Dict[int, Dict[str, str]]:
+        """Data of the `database` or `database-pooler` relation, fetched at most once per hook."""
+
+        def fetch() -> Dict[int, Dict[str, str]]:
+            with self._profiler.measure('hook-tool.fetch_relation_data'):
+                return requirer.fetch_relation_data()
+
+        return self._cache.get(requirer.relation_name, fetch)
+
+    def _get_plan(self) -> ops.pebble.Plan:
+        """The Pebble plan of the workload container, fetched at most once per hook."""
+
+        def fetch() -> ops.pebble.Plan:
+            with self._profiler.measure('pebble.get_plan'):
+                return self.container.get_plan()
+
+        return self._cache.get('plan', fetch)
+
+    def _get_checks(self) -> Dict[str, ops.pebble.CheckInfo]:
+        """State of the workload's Pebble health checks, fetched at most once per hook."""
+
+        def fetch() -> Dict[str, ops.pebble.CheckInfo]:
+            with self._profiler.measure('pebble.get_checks'):
+                return {check.name: check for check in self.container.get_checks()}
+
+        return self._cache.get('checks', fetch)
+
+    @staticmethod
+    def _check_is_down(checks: Dict[str, ops.pebble.CheckInfo], name: str) -> bool:
+        """Whether the named check exists and has failed `threshold` times in a row."""
+        return name in checks and checks[name].status == ops.pebble.CheckStatus.DOWN
+
+    def _get_service(self) -> ops.pebble.ServiceInfo:
+        """Status of the FastAPI service, fetched at most once per hook or until it is restarted."""
+
+        def fetch() -> ops.pebble.ServiceInfo:
+            with self._profiler.measure('pebble.get_service'):
+                return self.container.get_service(self.pebble_service_name)
+
+        return self._cache.get('service', fetch)
     
     def fetch_postgres_relation_data(self) -> Dict[str, str]:
         """
@@ -179,21 +1124,33 @@ class FastAPIDemoCharm(ops.CharmBase):
         endpoint information, username, and password. This processed data is then returned as
         a dictionary. If no data is retrieved, the unit is set to waiting status and
         the program exits with a zero status code.
+
+        A pooler on the `database-pooler` relation is preferred over PostgreSQL on `database`;
+        `db_path` tells which one the data came from.
         """
-        relations = self.database.fetch_relation_data()
-        logger.debug('Got following database data: %s', relations)
-        for data in relations.values():
-            if not data:
-                continue
-            logger.info('New PSQL database endpoint is %s', data['endpoints'])
-            host, port = data['endpoints'].split(':')
-            db_data = {
-                'db_host': host,
-                'db_port': port,
-                'db_username': data['username'],
-                'db_password': data['password'],
-            }
-            return db_data
+        for requirer, path in ((self.pooler, 'pooler'), (self.database, 'direct')):
+            relations = self._relation_data(requirer)
+            logger.debug('Got following %s data: %s', requirer.relation_name, relations)
+            for data in relations.values():
+                if not data:
+                    continue
+                logger.info('New PSQL database endpoint is %s (%s)', data['endpoints'], path)
+                primary = self._by_latency(db_endpoints.parse_endpoints(data['endpoints']), 'primary')
+                host, port = primary[0]
+                db_data = {
+                    'db_host': host,
+                    'db_port': port,
+                    'db_username': data['username'],
+                    'db_password': data['password'],
+                    'db_name': data.get('database') or requirer.database,
+                    'db_endpoints': ','.join(map(db_latency.endpoint_key, primary)),
+                    'db_read_only_endpoints': data.get('read-only-endpoints', ''),
+                    'db_path': path,
+                }
+                if data.get('max-connections'):
+                    # Not part of the postgresql_client interface, but honoured if a provider sets it.
+                    db_data['db_max_connections'] = data['max-connections']
+                return db_data
         return {}
     
     @property
@@ -204,52 +1161,225 @@ class FastAPIDemoCharm(ops.CharmBase):
         the `fetch_postgres_relation_data` method and uses it to populate the dictionary.
         If any of the values are not present, it will be set to None.
         The method returns this dictionary as output.
+        The logging and response cache settings that differ from the app's defaults are
+        always included.
         """
+        env: Dict[str, Optional[str]] = dict(self._logging_options.environment)
+        env.update(self._cache_options.environment(self._redis_url()))
         db_data = self.fetch_postgres_relation_data()
         if not db_data:
-            return {}
-        env = {
+            return env
+        env.update({
             'DEMO_SERVER_DB_HOST': db_data.get('db_host', None),
             'DEMO_SERVER_DB_PORT': db_data.get('db_port', None),
             'DEMO_SERVER_DB_USER': db_data.get('db_username', None),
             'DEMO_SERVER_DB_PASSWORD': db_data.get('db_password', None),
-        }
+        })
+        env.update(self._endpoint_environment(db_data))
+        env.update(self._pool_settings(db_data).environment)
+        if db_data['db_path'] == 'pooler':
+            env.update(db_pool.pooler_environment())
         return env
-    
-    def _on_database_created(self, event: DatabaseCreatedEvent) -> None:
-        """Event is fired when postgres database is created."""
-        self._update_layer_and_restart()
 
+    def _endpoint_environment(self, db_data: Dict[str, str]) -> Dict[str, str]:
+        """
+        The primary as a single DSN (listing every advertised primary endpoint for failover) and
+        the read-only replicas as a comma-separated list of DSNs, in this unit's preferred order.
+        """
+        user, password, name = db_data['db_username'], db_data['db_password'], db_data['db_name']
+        primary = db_endpoints.parse_endpoints(db_data['db_endpoints'])
+        replicas = self._replicas(db_data)
+        env = {'DEMO_SERVER_DB_DSN': db_endpoints.dsn(primary, user, password, name)}
+        if replicas:
+            env['DEMO_SERVER_DB_REPLICA_DSNS'] = ','.join(
+                db_endpoints.dsn([replica], user, password, name) for replica in replicas
+            )
+        return env
+
+    def _replicas(self, db_data: Dict[str, str]) -> List[db_endpoints.Endpoint]:
+        """The read-only replicas in this unit's preferred order."""
+        replicas = db_endpoints.order_replicas(
+            db_endpoints.parse_endpoints(db_data['db_read_only_endpoints']),
+            self.unit.name,
+            cast(str, self.config['db-replica-selection']),
+        )
+        return self._by_latency(replicas, 'replicas')
+
+    @property
+    def _db_latency(self) -> Dict[str, Any]:
+        """The last probe results: `rtt` in ms per endpoint and the `selected` endpoint per role."""
+        return json.loads(self._stored.db_latency)
+
+    def _by_latency(
+        self, endpoints: List[db_endpoints.Endpoint], role: str
+    ) -> List[db_endpoints.Endpoint]:
+        """Put the fastest endpoint first if `db-endpoint-selection` is 'latency'."""
+        if self.config['db-endpoint-selection'] != 'latency':
+            return endpoints
+        latency = self._db_latency
+        return db_latency.rank(endpoints, latency.get('rtt', {}), latency.get('selected', {}).get(role))
+
+    def _probe_db_latency(self, force: bool = False) -> bool:
+        """
+        Measure the round trip to every advertised database endpoint from the workload container
+        and select the fastest reachable primary and replica endpoints. Without `force` only new
+        endpoints are probed, so most hooks cost nothing; endpoints-changed and update-status
+        probe again. Returns whether the selection changed.
+        """
+        if self.config['db-endpoint-selection'] != 'latency':
+            return False
+        try:
+            self._validate_config()
+        except ValueError:
+            # Invalid config is reported by the collect-status handler.
+            return False
+        db_data = self.fetch_postgres_relation_data()
+        if not db_data:
+            return False
+        primary = db_endpoints.parse_endpoints(db_data['db_endpoints'])
+        replicas = self._replicas(db_data)
+        endpoints = sorted({db_latency.endpoint_key(endpoint) for endpoint in primary + replicas})
+        latency = self._db_latency
+        if not force and sorted(latency.get('rtt', {})) == endpoints:
+            return False
+        if not self.container.can_connect():
+            return False
+        try:
+            with open(db_latency.__file__) as f:
+                with self._profiler.measure('pebble.push'):
+                    self.container.push(db_latency.SCRIPT_PATH, f.read(), make_dirs=True)
+            timeout = len(endpoints) * db_latency.ATTEMPTS * db_latency.CONNECT_TIMEOUT + 10
+            with self._profiler.measure('pebble.exec'):
+                process = self.container.exec(
+                    ['python3', db_latency.SCRIPT_PATH, *endpoints], timeout=timeout
+                )
+                stdout, _ = process.wait_output()
+            rtts = json.loads(stdout)
+        except (
+            ops.pebble.ExecError,
+            ops.pebble.ChangeError,
+            ops.pebble.TimeoutError,
+            ops.pebble.APIError,
+            ops.pebble.ConnectionError,
+            ops.pebble.PathError,
+            ValueError,
+        ) as e:
+            logger.warning('Database latency probe failed, keeping the last results: %s', e)
+            return False
+        previous = latency.get('selected', {})
+        selected = {}
+        for role, candidates in (('primary', primary), ('replicas', replicas)):
+            if candidates:
+                fastest = db_latency.rank(candidates, rtts, previous.get(role))[0]
+                selected[role] = db_latency.endpoint_key(fastest)
+        self._stored.db_latency = json.dumps({'rtt': rtts, 'selected': selected}, sort_keys=True)
+        self._cache.invalidate('desired')
+        if selected != previous:
+            logger.info('Selected database endpoints by latency: %s', selected)
+        return selected != previous
+
+    def _pool_settings(self, db_data: Dict[str, str]) -> db_pool.PoolSettings:
+        """
+        Size this unit's per-worker connection pool so that all units together stay within the
+        database's connection limit, with the unit count rounded as in `db_pool.sizing_units`
+        so that small scale changes do not restart the units. The limit comes from the
+        `db-max-connections` option, or from the relation if the option is 0 and the provider
+        advertises one.
+        """
+        max_connections = cast(int, self.config['db-max-connections']) or int(
+            db_data.get('db_max_connections', db_pool.DEFAULT_MAX_CONNECTIONS)
+        )
+        return db_pool.pool_settings(
+            max_connections=max_connections,
+            reserved=cast(int, self.config['db-reserved-connections']),
+            units=self._unit_count,
+            workers=self._worker_count,
+            pool_timeout=cast(int, self.config['db-pool-timeout']),
+        )
+
+    @property
+    def _unit_count(self) -> int:
+        """Number of live units in the application, this one included."""
+        return len(self.peers.units) + 1 if self.peers else 1
+    
     @property
     def peers(self) -> Optional[ops.Relation]:
         """Fetch the peer relation."""
         return self.model.get_relation(PEER_NAME)
 
-    def set_peer_data(self, key: str, data: JSONData) -> None:
-        """Put information into the peer data bucket instead of `StoredState`."""
+    def set_peer_data(
+        self, key: str, data: JSONData, bucket: Optional[Union[ops.Application, ops.Unit]] = None
+    ) -> None:
+        """
+        Put information into the peer data bucket instead of `StoredState`.
+
+        The application bucket is used by default; pass `self.unit` to write to this unit's bucket.
+        Writing an unchanged value is skipped, as every write fans out a relation-changed event
+        to all peers.
+        """
         peers = cast(ops.Relation, self.peers)
-        peers.data[self.app][key] = json.dumps(data)
+        with self._profiler.measure('peer-data.encode'):
+            encoded = json.dumps(data, sort_keys=True)
+        databag = peers.data[bucket or self.app]
+        with self._profiler.measure('hook-tool.relation-get'):
+            if databag.get(key) == encoded:
+                return
+        with self._profiler.measure('hook-tool.relation-set'):
+            databag[key] = encoded
 
-    def get_peer_data(self, key: str) -> Dict[str, JSONData]:
+    def get_peer_data(
+        self, key: str, bucket: Optional[Union[ops.Application, ops.Unit]] = None
+    ) -> Dict[str, JSONData]:
         """Retrieve information from the peer data bucket instead of `StoredState`."""
         if not self.peers:
             return {}
-        data = self.peers.data[self.app].get(key, '')
+        with self._profiler.measure('hook-tool.relation-get'):
+            data = self.peers.data[bucket or self.app].get(key, '')
         if not data:
             return {}
-        return json.loads(data)
+        with self._profiler.measure('peer-data.decode'):
+            return json.loads(data)
     
+    @instrumentation.timed
     def _count(self, event: ops.StartEvent) -> None:
         """
         This function updates a counter for the number of times a K8s pod has been started.
 
-        It retrieves the current count of pod starts from the 'unit_stats' peer relation data,
-        increments the count, and then updates the 'unit_stats' data with the new count.
+        It retrieves the current count of pod starts from the 'unit_stats' key in this unit's
+        peer data bucket, increments the count, and then updates 'unit_stats' with the new count.
+        Each unit writes only its own bucket, so this works on non-leaders too; the counters are
+        only added up when asked for (see `_on_get_unit_stats_action`). The peer data outlives
+        the pod, so a crash-looping pod keeps its count; the relation-changed hooks the write
+        fans out to the peers do not reconcile (see `_on_peer_relation_changed`).
         """
-        unit_stats = self.get_peer_data('unit_stats')
-        counter = cast(str, unit_stats.get('started_counter', '0'))
-        self.set_peer_data('unit_stats', {'started_counter': int(counter) + 1})
+        if not self.peers:
+            logger.debug('Peer relation is not ready, pod start not counted')
+            return
+        unit_stats = self.get_peer_data('unit_stats', self.unit)
+        counter = cast(int, unit_stats.get('started_counter', 0))
+        self.set_peer_data('unit_stats', {'started_counter': int(counter) + 1}, self.unit)
+
+    def unit_stats(self) -> Dict[str, int]:
+        """Pod start counters of every unit, read from each unit's peer data bucket."""
+        if not self.peers:
+            return {}
+        return {
+            unit.name: int(cast(int, self.get_peer_data('unit_stats', unit).get('started_counter', 0)))
+            for unit in (self.unit, *self.peers.units)
+        }
 
+    @instrumentation.timed
+    def _on_get_unit_stats_action(self, event: ops.ActionEvent) -> None:
+        """Aggregate the per-unit pod start counters on demand."""
+        stats = self.unit_stats()
+        if not stats:
+            event.fail('Peer relation is not ready')
+            return
+        event.set_results(
+            {'started-counters': json.dumps(stats, sort_keys=True), 'started-total': sum(stats.values())}
+        )
+
+    @instrumentation.timed
     def _on_get_db_info_action(self, event: ops.ActionEvent) -> None:
         """
         This method is called when "get_db_info" action is called. It shows information about
@@ -257,6 +1387,9 @@ class FastAPIDemoCharm(ops.CharmBase):
         an output dictionary containing the host, port, if show_password is True, then include
         username, and password of the database.
         If PSQL charm is not integrated, the output is set to "No database connected".
+        `db-path` is 'pooler' when the app goes through PgBouncer, 'direct' otherwise.
+        `endpoint-latency-ms` has the last round trips measured with `db-endpoint-selection`
+        set to 'latency' (null for unreachable endpoints).
 
         Learn more about actions at https://juju.is/docs/sdk/actions
         """
@@ -268,7 +1401,14 @@ class FastAPIDemoCharm(ops.CharmBase):
         output = {
             'db-host': db_data.get('db_host', None),
             'db-port': db_data.get('db_port', None),
+            'db-path': db_data.get('db_path', None),
         }
+        revision = self._schema().get('revision')
+        if revision:
+            output['schema-revision'] = revision
+        rtts = self._db_latency.get('rtt')
+        if rtts:
+            output['endpoint-latency-ms'] = json.dumps(rtts, sort_keys=True)
         if show_password:
             output.update(
                 {
@@ -278,5 +1418,109 @@ class FastAPIDemoCharm(ops.CharmBase):
             )
         event.set_results(output)
 
+    def _on_get_hook_profile_action(self, event: ops.ActionEvent) -> None:
+        """Return the timing summary of the last profiled hook on this unit."""
+        if not self.config['hook-profiling']:
+            event.fail('Hook profiling is disabled, set the hook-profiling option to enable it')
+            return
+        event.set_results({'summary': self._stored.hook_profile})
+
+    def _run_load_test(
+        self, path: str, duration: float, concurrency: int, rate: float
+    ) -> Dict[str, Any]:
+        """Run the load test script in the workload container and return its summary."""
+        with open(load_test.__file__) as f:
+            self.container.push(load_test.SCRIPT_PATH, f.read(), make_dirs=True)
+        command = [
+            'python3',
+            load_test.SCRIPT_PATH,
+            f"--port={self.config['server-port']}",
+            f'--path={path}',
+            f'--duration={duration}',
+            f'--concurrency={concurrency}',
+            f'--rate={rate}',
+        ]
+        with self._profiler.measure('pebble.exec'):
+            process = self.container.exec(command, timeout=duration + load_test.REQUEST_TIMEOUT + 30)
+            stdout, _ = process.wait_output()
+        return json.loads(stdout)
+
+    @instrumentation.timed
+    def _on_run_load_test_action(self, event: ops.ActionEvent) -> None:
+        """
+        Load the server from inside the workload container and report throughput, error rate
+        and latency percentiles, compared with the previous run on this unit.
+        """
+        duration = cast(int, event.params['duration'])
+        concurrency = cast(int, event.params['concurrency'])
+        rate = cast(float, event.params['rate'])
+        path = cast(str, event.params['path'])
+        if not path.startswith('/'):
+            event.fail("path must start with '/'")
+            return
+        if not self.container.can_connect():
+            event.fail('Pebble in the workload container is not ready')
+            return
+        try:
+            workers = self._worker_count
+        except ValueError as e:
+            event.fail(f'Invalid config: {e}')
+            return
+        event.log(f'Loading {path} for {duration}s with {concurrency} connections')
+        try:
+            summary = self._run_load_test(path, duration, concurrency, rate)
+        except ops.pebble.ExecError as e:
+            event.fail(f'Load test failed: {e.stderr or e}')
+            return
+        except (
+            ops.pebble.APIError,
+            ops.pebble.ChangeError,
+            ops.pebble.PathError,
+            ops.pebble.TimeoutError,
+            ValueError,
+        ) as e:
+            event.fail(f'Load test failed: {e}')
+            return
+
+        run = {
+            'summary': summary,
+            'workers': workers,
+            'params': {'path': path, 'duration': duration, 'concurrency': concurrency, 'rate': rate},
+        }
+        results: Dict[str, Any] = {**load_test.action_results(summary), 'workers': run['workers']}
+        previous = json.loads(self._stored.load_test)
+        if previous:
+            results['previous'] = {
+                **load_test.action_results(previous['summary']),
+                'workers': previous['workers'],
+                'params': json.dumps(previous['params'], sort_keys=True),
+            }
+            results['change'] = load_test.action_results(
+                load_test.compare(previous['summary'], summary)
+            )
+        self._stored.load_test = json.dumps(run)
+        event.set_results(results)
+
+    def _on_pre_commit(self, event: ops.PreCommitEvent) -> None:
+        """
+        Keep the evaluated status; log and keep the timing summary of this dispatch, and dump
+        cProfile stats if enabled.
+        """
+        self._record_status()
+        if not self._profiler.enabled:
+            return
+        hook = os.path.basename(os.environ.get('JUJU_DISPATCH_PATH', 'unknown'))
+        summary = {'hook': hook, **self._profiler.summary()}
+        profile = self._profiler.dump_profile(hook)
+        if profile:
+            summary['cprofile'] = profile['path']
+            logger.info('cProfile stats for %s:\n%s', hook, profile['top'])
+        logger.info('Hook profile: %s', json.dumps(summary))
+        self._stored.hook_profile = json.dumps(summary)
+
+    def _on_commit(self, event: ops.CommitEvent) -> None:
+        """Report how many hook-tool and Pebble calls the per-hook cache saved."""
+        logger.debug('Hook cache stats: %s', self._cache.stats())
+
 if __name__ == "__main__":  # pragma: nocover
     ops.main(FastAPIDemoCharm)
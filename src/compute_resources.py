@@ -0,0 +1,114 @@
+"""
+CPU and memory requests and limits of the workload container, from charm config.
+
+A request that is not set defaults to the limit, so the container is scheduled for what it may
+use; the pod stays Burstable at best, as the charm container has no requests or limits of its
+own. The same values are exported to the workload so it can size its threads and pools, and a
+CPU limit decides the number of uvicorn workers when `workers` is 'auto'.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Union
+
+# Kubernetes quantities as accepted here: cores or millicores, and bytes with an optional suffix.
+CPU_QUANTITY = re.compile(r'^(?P<value>\d+(\.\d+)?)(?P<milli>m)?$')
+MEMORY_QUANTITY = re.compile(r'^(?P<value>\d+(\.\d+)?)(?P<unit>Ki|Mi|Gi|Ti|k|M|G|T)?$')
+MEMORY_UNITS = {
+    None: 1,
+    'k': 10**3,
+    'M': 10**6,
+    'G': 10**9,
+    'T': 10**12,
+    'Ki': 2**10,
+    'Mi': 2**20,
+    'Gi': 2**30,
+    'Ti': 2**40,
+}
+
+
+def parse_cpu(quantity: str) -> float:
+    """CPU cores of a quantity such as `2`, `0.5` or `500m`; raises ValueError if invalid."""
+    match = CPU_QUANTITY.match(quantity)
+    if not match or float(match['value']) <= 0:
+        raise ValueError(f"'{quantity}' is not a CPU quantity such as 2, 0.5 or 500m")
+    cores = float(match['value'])
+    return cores / 1000 if match['milli'] else cores
+
+
+def parse_memory(quantity: str) -> int:
+    """Bytes of a quantity such as `512Mi` or `1G`; raises ValueError if invalid."""
+    match = MEMORY_QUANTITY.match(quantity)
+    if not match or float(match['value']) <= 0:
+        raise ValueError(f"'{quantity}' is not a memory quantity such as 512Mi or 1Gi")
+    return int(float(match['value']) * MEMORY_UNITS[match['unit']])
+
+
+@dataclass(frozen=True)
+class ComputeResources:
+    """Validated quantities; an empty string means not set."""
+
+    cpu_request: str = ''
+    cpu_limit: str = ''
+    memory_request: str = ''
+    memory_limit: str = ''
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Union[bool, int, float, str]]) -> 'ComputeResources':
+        """Build from charm config, raising ValueError on an invalid or inconsistent value."""
+        values = {
+            key: str(config[key]).strip()
+            for key in ('cpu-request', 'cpu-limit', 'memory-request', 'memory-limit')
+        }
+        for key, value in values.items():
+            if value:
+                parse = parse_cpu if key.startswith('cpu') else parse_memory
+                try:
+                    parse(value)
+                except ValueError as e:
+                    raise ValueError(f'{key}: {e}') from None
+        cpu_limit, memory_limit = values['cpu-limit'], values['memory-limit']
+        resources = cls(
+            cpu_request=values['cpu-request'] or cpu_limit,
+            cpu_limit=cpu_limit,
+            memory_request=values['memory-request'] or memory_limit,
+            memory_limit=memory_limit,
+        )
+        if cpu_limit and parse_cpu(resources.cpu_request) > parse_cpu(cpu_limit):
+            raise ValueError('cpu-request must not exceed cpu-limit')
+        if memory_limit and parse_memory(resources.memory_request) > parse_memory(memory_limit):
+            raise ValueError('memory-request must not exceed memory-limit')
+        return resources
+
+    @property
+    def limits(self) -> Dict[str, str]:
+        """The `limits` of the container spec."""
+        return _spec(cpu=self.cpu_limit, memory=self.memory_limit)
+
+    @property
+    def requests(self) -> Dict[str, str]:
+        """The `requests` of the container spec."""
+        return _spec(cpu=self.cpu_request, memory=self.memory_request)
+
+    @property
+    def cpu_limit_cores(self) -> Optional[float]:
+        """The CPU limit in cores, or None if there is none."""
+        return parse_cpu(self.cpu_limit) if self.cpu_limit else None
+
+    @property
+    def environment(self) -> Dict[str, str]:
+        """CPUs in cores and memory in bytes, as `DEMO_SERVER_*` variables for the workload."""
+        env = {}
+        if self.cpu_request:
+            env['DEMO_SERVER_CPU_REQUEST'] = str(parse_cpu(self.cpu_request))
+        if self.cpu_limit:
+            env['DEMO_SERVER_CPU_LIMIT'] = str(parse_cpu(self.cpu_limit))
+        if self.memory_request:
+            env['DEMO_SERVER_MEMORY_REQUEST'] = str(parse_memory(self.memory_request))
+        if self.memory_limit:
+            env['DEMO_SERVER_MEMORY_LIMIT'] = str(parse_memory(self.memory_limit))
+        return env
+
+
+def _spec(cpu: str, memory: str) -> Dict[str, str]:
+    """A requests or limits mapping with only the quantities that are set."""
+    return {name: value for name, value in (('cpu', cpu), ('memory', memory)) if value}
@@ -0,0 +1,57 @@
+"""
+Parsing of the database endpoints published on the postgresql_client relation.
+
+The provider publishes `endpoints` (the primary, possibly several comma-separated host:port
+pairs) and optionally `read-only-endpoints` (the replicas). Each unit is given its own replica
+order so that read traffic is spread over all replicas instead of piling onto one of them.
+"""
+import zlib
+from typing import List, Tuple
+from urllib.parse import quote
+
+REPLICA_STRATEGIES = ('round-robin', 'hash')
+
+Endpoint = Tuple[str, str]
+
+
+def parse_endpoints(value: str) -> List[Endpoint]:
+    """Split a comma-separated list of `host:port` pairs, skipping empty entries."""
+    endpoints = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':')
+        endpoints.append((host, port) if host else (port, '5432'))
+    return endpoints
+
+
+def dsn(endpoints: List[Endpoint], user: str, password: str, database: str) -> str:
+    """
+    A libpq connection URI for the given endpoints. With several endpoints, libpq tries them in
+    order; `target_session_attrs=read-write` makes it skip any that is not the primary.
+    """
+    hosts = ','.join(f'{host}:{port}' for host, port in endpoints)
+    uri = f'postgresql://{quote(user, safe="")}:{quote(password, safe="")}@{hosts}/{database}'
+    if len(endpoints) > 1:
+        uri += '?target_session_attrs=read-write'
+    return uri
+
+
+def order_replicas(replicas: List[Endpoint], unit_name: str, strategy: str) -> List[Endpoint]:
+    """
+    Rotate the replica list so that this unit's preferred replica comes first, with the others
+    kept as fallbacks. `round-robin` uses the unit number, `hash` a CRC32 of the unit name
+    (stable even when unit numbers are not contiguous).
+    """
+    if strategy not in REPLICA_STRATEGIES:
+        raise ValueError(f"db-replica-selection must be one of {', '.join(REPLICA_STRATEGIES)}")
+    if not replicas:
+        return []
+    ordered = sorted(replicas)
+    if strategy == 'round-robin':
+        offset = int(unit_name.rpartition('/')[2])
+    else:
+        offset = zlib.crc32(unit_name.encode())
+    offset %= len(ordered)
+    return ordered[offset:] + ordered[:offset]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Round-trip probe of the database endpoints, for latency-aware endpoint selection.
+
+In multi-zone clusters the endpoint a provider lists first may sit in another zone than the
+unit, which adds a cross-zone hop to every query. With `db-endpoint-selection` set to
+'latency' the charm pushes this file into the workload container and runs it there with the
+image's Python, so the round trips are measured from where the app connects. Each endpoint
+gets a few TCP connects and its fastest one counts; endpoints that cannot be reached are
+reported as null. A JSON object of milliseconds per `host:port` is printed on stdout.
+
+The charm also imports this module for `rank`.
+"""
+import argparse
+import json
+import socket
+import sys
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+SELECTION_MODES = ('advertised', 'latency')
+
+# Where the charm pushes this script in the workload container.
+SCRIPT_PATH = '/tmp/fastapi-demo-db-latency.py'
+
+# Seconds a single TCP connect may take before the endpoint counts as unreachable.
+CONNECT_TIMEOUT = 1.0
+
+# Connects per endpoint; the fastest is kept, which filters out scheduling noise.
+ATTEMPTS = 3
+
+# Endpoints within this margin of the fastest count as equally close: a faster endpoint must
+# win by more than this to replace the selected one, and units keep spreading over replicas
+# that are about equally close.
+SWITCH_MARGIN_MS = 1.0
+
+Endpoint = Tuple[str, str]
+
+
+def endpoint_key(endpoint: Endpoint) -> str:
+    """The `host:port` form endpoints are reported and stored in."""
+    return f'{endpoint[0]}:{endpoint[1]}'
+
+
+def probe_endpoint(host: str, port: int, timeout: float = CONNECT_TIMEOUT) -> Optional[float]:
+    """Fastest TCP connect to the endpoint in milliseconds, or None if it never answered."""
+    best: Optional[float] = None
+    for _ in range(ATTEMPTS):
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                pass
+        except OSError:
+            continue
+        rtt = (time.perf_counter() - start) * 1000
+        best = rtt if best is None else min(best, rtt)
+    return round(best, 3) if best is not None else None
+
+
+def probe(endpoints: Sequence[str], timeout: float = CONNECT_TIMEOUT) -> Dict[str, Optional[float]]:
+    """Probe each `host:port` endpoint in turn."""
+    results = {}
+    for endpoint in endpoints:
+        host, _, port = endpoint.rpartition(':')
+        results[endpoint] = probe_endpoint(host, int(port), timeout)
+    return results
+
+
+def rank(
+    endpoints: List[Endpoint], rtts: Mapping[str, Optional[float]], current: Optional[str] = None
+) -> List[Endpoint]:
+    """
+    Order endpoints fastest first: reachable ones by round trip, then those not probed yet, then
+    unreachable ones, each group keeping the given order among equals. Reachable endpoints
+    within `SWITCH_MARGIN_MS` of the fastest count as equals, so a per-unit order such as
+    `db_endpoints.order_replicas` still spreads the units over them. `current`, the endpoint
+    selected before, stays first while it is one of them.
+    """
+
+    def key(endpoint: Endpoint) -> Tuple[int, float]:
+        name = endpoint_key(endpoint)
+        if name not in rtts:
+            return (1, 0.0)
+        rtt = rtts[name]
+        return (0, rtt) if rtt is not None else (2, 0.0)
+
+    ordered = sorted(endpoints, key=key)
+    if not ordered or key(ordered[0])[0] != 0:
+        return ordered
+    fastest = key(ordered[0])[1]
+    closest = [e for e in endpoints if key(e)[0] == 0 and key(e)[1] - fastest <= SWITCH_MARGIN_MS]
+    closest.sort(key=lambda endpoint: endpoint_key(endpoint) != current)
+    return closest + [endpoint for endpoint in ordered if endpoint not in closest]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('endpoints', nargs='+', metavar='HOST:PORT')
+    parser.add_argument('--timeout', type=float, default=CONNECT_TIMEOUT)
+    args = parser.parse_args(argv)
+    json.dump(probe(args.endpoints, args.timeout), sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Application-wide PostgreSQL connection pool sizing.
+
+Every uvicorn worker of every unit keeps its own SQLAlchemy pool, so the connection budget of the
+database has to be split by the number of live units and by the workers in each of them. Without
+that, scaling out multiplies the pools until PostgreSQL refuses connections.
+
+Changing the pool settings restarts (or reloads) the workload of every unit, so the unit count is
+rounded up to a multiple of `UNIT_STEP` first: the settings only change when scaling crosses
+one, not on every unit added or removed. Rounding up keeps the total within the budget, at the
+cost of leaving the share of up to `UNIT_STEP - 1` units unused.
+"""
+from dataclasses import dataclass
+from typing import Dict
+
+# PostgreSQL's default max_connections, used when neither config nor the relation set a limit.
+DEFAULT_MAX_CONNECTIONS = 100
+
+# Seconds before a pooled connection is replaced when the app goes through a pooler.
+POOLER_POOL_RECYCLE = 300
+
+# The unit count the budget is split by is rounded up to a multiple of this.
+UNIT_STEP = 3
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Pool parameters for a single worker process."""
+
+    pool_size: int
+    max_overflow: int
+    pool_timeout: int
+
+    @property
+    def environment(self) -> Dict[str, str]:
+        """The settings as `DEMO_SERVER_DB_*` environment variables for the workload."""
+        return {
+            'DEMO_SERVER_DB_POOL_SIZE': str(self.pool_size),
+            'DEMO_SERVER_DB_MAX_OVERFLOW': str(self.max_overflow),
+            'DEMO_SERVER_DB_POOL_TIMEOUT': str(self.pool_timeout),
+        }
+
+
+def sizing_units(units: int) -> int:
+    """The unit count the budget is split by: `units` rounded up to a multiple of `UNIT_STEP`."""
+    return -(-max(1, units) // UNIT_STEP) * UNIT_STEP
+
+
+def pool_settings(
+    max_connections: int, reserved: int, units: int, workers: int, pool_timeout: int
+) -> PoolSettings:
+    """
+    Split `max_connections` (minus `reserved` for admin and replication) over all workers of
+    `sizing_units(units)` units.
+
+    Three quarters of each worker's share are kept open in the pool and the rest is allowed as
+    overflow, so idle units hold fewer connections while bursts can still use the full share.
+    Every worker gets at least one pooled connection, even if that oversubscribes the database.
+    """
+    budget = max(0, max_connections - reserved)
+    per_worker = budget // (sizing_units(units) * max(1, workers))
+    pool_size = max(1, per_worker * 3 // 4)
+    return PoolSettings(
+        pool_size=pool_size,
+        max_overflow=max(0, per_worker - pool_size),
+        pool_timeout=pool_timeout,
+    )
+
+
+def pooler_environment(pool_recycle: int = POOLER_POOL_RECYCLE) -> Dict[str, str]:
+    """
+    Settings for connecting through a transaction-mode pooler such as PgBouncer. Consecutive
+    transactions may run on different server connections, so server-side prepared statements
+    must be off; pooled connections are recycled soon so they keep spreading over the pooler.
+    """
+    return {
+        'DEMO_SERVER_DB_PREPARED_STATEMENTS': 'false',
+        'DEMO_SERVER_DB_POOL_RECYCLE': str(pool_recycle),
+    }
@@ -0,0 +1,58 @@
+"""
+Pebble health checks for the FastAPI workload.
+
+The liveness check only asks whether uvicorn accepts TCP connections; Pebble acts on it through
+the service's `on-check-failure` policy. The readiness check makes an HTTP request, so it stays
+down while Python imports are still running or the application cannot answer, and the charm
+reports the unit as not ready until it passes.
+"""
+from typing import Any, Dict, Mapping
+
+import ops
+
+LIVENESS_CHECK = 'fastapi-live'
+READINESS_CHECK = 'fastapi-ready'
+
+ON_CHECK_FAILURE_ACTIONS = ('restart', 'shutdown', 'ignore')
+
+
+def pebble_duration(seconds: int) -> str:
+    """
+    Format seconds the way Pebble reports durations in its plan (Go's `time.Duration`), e.g.
+    `1m30s`, so that comparing the plan with a freshly built layer does not see a false change.
+    """
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f'{hours}h{minutes}m{seconds}s'
+    if minutes:
+        return f'{minutes}m{seconds}s'
+    return f'{seconds}s'
+
+
+def layer_checks(
+    port: int, period: int, timeout: int, threshold: int
+) -> Dict[str, ops.pebble.CheckDict]:
+    """The `checks` section of the Pebble layer, with durations given in seconds."""
+    timing: ops.pebble.CheckDict = {
+        'override': 'replace',
+        'period': pebble_duration(period),
+        'timeout': pebble_duration(timeout),
+        'threshold': threshold,
+    }
+    return {
+        LIVENESS_CHECK: {**timing, 'level': 'alive', 'tcp': {'port': port}},
+        READINESS_CHECK: {**timing, 'level': 'ready', 'http': {'url': f'http://localhost:{port}/'}},
+    }
+
+
+def checks_match(current: Mapping[str, Any], desired: Mapping[str, Mapping[str, Any]]) -> bool:
+    """
+    Whether the plan's checks already have every field the charm sets. Fields the charm does not
+    set (such as defaults newer Pebble versions report) are ignored.
+    """
+    for name, check in desired.items():
+        existing = current.get(name) or {}
+        if any(existing.get(field) != value for field, value in check.items()):
+            return False
+    return True
@@ -0,0 +1,56 @@
+"""
+Per-dispatch snapshot cache for hook-tool and Pebble lookups.
+
+Juju starts a fresh charm process for every hook, so anything memoized on the charm instance
+lives exactly as long as one dispatch. That makes the charm instance a natural place to keep
+relation data, the Pebble plan and service status that several handlers would otherwise fetch
+again and again (each fetch being a hook-tool subprocess or a Pebble socket round trip).
+"""
+import logging
+from typing import Any, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class HookCache:
+    """
+    Memoize expensive lookups for the lifetime of a single hook dispatch.
+
+    Values are fetched lazily on first use and kept until the charm invalidates them, which it
+    must do whenever it writes something that would change the answer (for example, adding a
+    Pebble layer invalidates the cached plan). Fetches that raise are not cached.
+    """
+
+    def __init__(self) -> None:
+        self._values: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str, fetch: Callable[[], T]) -> T:
+        """Return the cached value for `key`, calling `fetch` only on the first lookup."""
+        if key in self._values:
+            self.hits += 1
+            return self._values[key]
+        self.misses += 1
+        value = fetch()
+        self._values[key] = value
+        return value
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop the given keys, or every cached value if no key is given."""
+        for key in keys or list(self._values):
+            if key in self._values:
+                del self._values[key]
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the current dispatch; every hit is a hook-tool or Pebble call saved."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'saved_calls': self.hits,
+        }
@@ -0,0 +1,113 @@
+"""
+Opt-in timing of hook handlers and of the external calls they make.
+
+When enabled with the `hook-profiling` option, every measured section is logged as a JSON line
+and summed up per dispatch, so `juju debug-log` shows where hook time goes: hook-tool calls,
+Pebble API calls, the HTTP version probe or peer data encoding. With `hook-profiling-cprofile`
+the whole dispatch also runs under cProfile and the stats are dumped to a file in the charm
+container. Disabled, the instrumentation costs one attribute check per measured section.
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+if TYPE_CHECKING:
+    import cProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = '/tmp/fastapi-demo-profiles'
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class HookProfiler:
+    """Collect wall-clock timings for one dispatch."""
+
+    def __init__(self, enabled: bool, cprofile: bool = False) -> None:
+        self.enabled = enabled
+        self.timings: Dict[str, List[float]] = {}
+        self._started = time.perf_counter()
+        self._profile: Optional['cProfile.Profile'] = None
+        if enabled and cprofile:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    @contextlib.contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Time the enclosed block under `name` (for example `pebble.get_plan`)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings.setdefault(name, []).append(elapsed)
+            logger.debug(json.dumps({'timing': name, 'ms': round(elapsed * 1000, 3)}))
+
+    def summary(self) -> Dict[str, Any]:
+        """Call count, total and maximum milliseconds per measured name, plus the dispatch total."""
+        sections = {
+            name: {
+                'calls': len(values),
+                'total_ms': round(sum(values) * 1000, 3),
+                'max_ms': round(max(values) * 1000, 3),
+            }
+            for name, values in sorted(self.timings.items())
+        }
+        summary: Dict[str, Any] = {
+            'dispatch_ms': round((time.perf_counter() - self._started) * 1000, 3),
+            'sections': sections,
+        }
+        process_ms = process_age_ms()
+        if process_ms is not None:
+            # Includes interpreter start-up and imports, which `dispatch_ms` does not.
+            summary['process_ms'] = process_ms
+        return summary
+
+    def dump_profile(self, hook_name: str, limit: int = 25) -> Optional[Dict[str, str]]:
+        """Stop cProfile, write the stats next to earlier dumps and return the path and top entries."""
+        if not self._profile:
+            return None
+        import io
+        import pstats
+
+        self._profile.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f'{int(time.time())}-{hook_name}.prof')
+        self._profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return {'path': path, 'top': out.getvalue()}
+
+
+def process_age_ms() -> Optional[float]:
+    """Milliseconds since this process started, from /proc; None where /proc is unavailable."""
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces, so count fields from the closing parenthesis.
+            start_ticks = int(f.read().rpartition(')')[2].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round((uptime - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000, 3)
+
+
+def timed(method: F) -> F:
+    """Measure a charm method under `handler.<name>`; the charm must have a `_profiler`."""
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with self._profiler.measure(f'handler.{method.__name__}'):
+            return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
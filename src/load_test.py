@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Load test for the run-load-test action.
+
+The charm pushes this file into the workload container and runs it there with the image's
+Python, against the server on localhost. It therefore only uses the standard library and needs
+no network access beyond the pod. Each of `concurrency` threads keeps one keep-alive connection
+and sends GET requests in a closed loop, optionally paced so that all threads together stay at
+`rate` requests per second. A JSON summary is printed on stdout.
+
+The charm also imports this module for `action_results` and `compare`.
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+# Where the charm pushes this script in the workload container.
+SCRIPT_PATH = '/tmp/fastapi-demo-load-test.py'
+
+# Seconds to wait for a single response before counting the request as an error.
+REQUEST_TIMEOUT = 5.0
+
+# Summary fields compared between two runs, as relative changes.
+COMPARED = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending sequence; 0.0 if it is empty."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    """Throughput, error rate and latency percentiles (of successful requests) of one run."""
+    ordered = sorted(latencies)
+    requests = len(ordered) + errors
+
+    def ms(seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'rps': round(requests / elapsed, 2) if elapsed else 0.0,
+        'error_rate': round(errors / requests, 4) if requests else 0.0,
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1]) if ordered else 0.0,
+    }
+
+
+class _Client(threading.Thread):
+    """One connection sending requests until the deadline, every `interval` seconds at most."""
+
+    def __init__(self, host: str, port: int, path: str, deadline: float, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.host, self.port, self.path = host, port, path
+        self.deadline = deadline
+        self.interval = interval
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def run(self) -> None:
+        import http.client
+
+        conn: Optional[http.client.HTTPConnection] = None
+        next_send = time.monotonic()
+        while True:
+            if self.interval:
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send += self.interval
+            if time.monotonic() >= self.deadline:
+                break
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+                conn.request('GET', self.path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                if conn is not None:
+                    conn.close()
+                conn = None
+            if ok:
+                self.latencies.append(time.perf_counter() - start)
+            else:
+                self.errors += 1
+        if conn is not None:
+            conn.close()
+
+
+def run(host: str, port: int, path: str, duration: float, concurrency: int, rate: float) -> Dict[str, float]:
+    """Load `http://host:port/path` for `duration` seconds; `rate` 0 means as fast as possible."""
+    interval = concurrency / rate if rate else 0.0
+    start = time.monotonic()
+    clients = [
+        _Client(host, port, path, start + duration, interval) for _ in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - start
+    latencies = [latency for client in clients for latency in client.latencies]
+    return summarize(latencies, sum(client.errors for client in clients), elapsed)
+
+
+def action_results(summary: Mapping[str, Any]) -> Dict[str, Any]:
+    """A run's summary with the dashed keys Juju expects in action results."""
+    return {key.replace('_', '-'): value for key, value in summary.items()}
+
+
+def compare(previous: Mapping[str, Any], current: Mapping[str, Any]) -> Dict[str, str]:
+    """
+    Relative change of throughput and latencies since the previous run (for example before a
+    change of the worker count), plus the change of the error rate in percentage points.
+    """
+    changes = {}
+    for key in COMPARED:
+        before, after = float(previous.get(key, 0)), float(current.get(key, 0))
+        if before:
+            changes[key] = f'{(after - before) / before:+.1%}'
+    before_rate = float(previous.get('error_rate', 0))
+    after_rate = float(current.get('error_rate', 0))
+    changes['error_rate'] = f'{(after_rate - before_rate) * 100:+.2f}pp'
+    return changes
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+    summary = run(args.host, args.port, args.path, args.duration, args.concurrency, args.rate)
+    json.dump(summary, sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
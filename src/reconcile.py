@@ -0,0 +1,42 @@
+"""
+Desired state of a unit, for the charm's single reconcile path.
+
+Config, database and peer membership events all lead to the same question: which port should
+be open and which Pebble layer (command, environment and health checks) should the workload
+run? The charm renders the answer once per dispatch and remembers a fingerprint of the last
+state it applied, so a burst of relation events that change nothing ends after one hash
+comparison instead of another round of Pebble calls.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+@dataclass(frozen=True)
+class DesiredState:
+    """What the unit should look like, as rendered from config and relation data."""
+
+    port: int
+    layer: Dict[str, Any]
+
+    @property
+    def fingerprint(self) -> str:
+        """A stable hash of the whole desired state."""
+        encoded = json.dumps({'port': self.port, 'layer': self.layer}, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    @property
+    def services(self) -> Dict[str, Any]:
+        """The `services` section of the desired layer."""
+        return self.layer.get('services', {})
+
+    @property
+    def checks(self) -> Dict[str, Any]:
+        """The `checks` section of the desired layer."""
+        return self.layer.get('checks', {})
+
+    @property
+    def log_targets(self) -> Dict[str, Any]:
+        """The `log-targets` section of the desired layer."""
+        return self.layer.get('log-targets', {})
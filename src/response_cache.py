@@ -0,0 +1,86 @@
+"""
+Settings for the workload's response cache.
+
+Reads that rarely change can be answered from a cache instead of PostgreSQL. With a Redis
+(or Redis-compatible) application on the `cache` relation the workload uses it, together with
+the TTL, memory cap and eviction policy from config. Without one it can keep an in-process LRU
+cache per worker instead. Left at the defaults, with nothing related, caching stays off and
+nothing is added to the Pebble layer.
+"""
+import urllib.parse
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Union
+
+EVICTION_POLICIES = (
+    'noeviction',
+    'allkeys-lru',
+    'allkeys-lfu',
+    'allkeys-random',
+    'volatile-lru',
+    'volatile-lfu',
+    'volatile-random',
+    'volatile-ttl',
+)
+
+DEFAULT_REDIS_PORT = '6379'
+
+
+def redis_url(databags: Iterable[Mapping[str, str]]) -> Optional[str]:
+    """
+    The URL of the first Redis endpoint found in the relation data, which providers publish as
+    `hostname` (or `host`), `port` and an optional `password`.
+    """
+    for data in databags:
+        host = data.get('hostname') or data.get('host')
+        if not host:
+            continue
+        port = data.get('port') or DEFAULT_REDIS_PORT
+        password = data.get('password')
+        auth = f':{urllib.parse.quote(password, safe="")}@' if password else ''
+        return f'redis://{auth}{host}:{port}/0'
+    return None
+
+
+@dataclass(frozen=True)
+class CacheOptions:
+    """Validated cache options."""
+
+    ttl: int = 60
+    max_memory_mb: int = 0
+    eviction_policy: str = 'allkeys-lru'
+    lru_size: int = 0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Union[bool, int, float, str]]) -> 'CacheOptions':
+        """Build the options from charm config, raising ValueError on an invalid value."""
+        for key in ('cache-ttl', 'cache-max-memory-mb', 'cache-lru-size'):
+            if int(config[key]) < 0:
+                raise ValueError(f'{key} must not be negative')
+        if config['cache-eviction-policy'] not in EVICTION_POLICIES:
+            raise ValueError(f"cache-eviction-policy must be one of {', '.join(EVICTION_POLICIES)}")
+        return cls(
+            ttl=int(config['cache-ttl']),
+            max_memory_mb=int(config['cache-max-memory-mb']),
+            eviction_policy=str(config['cache-eviction-policy']),
+            lru_size=int(config['cache-lru-size']),
+        )
+
+    def environment(self, url: Optional[str]) -> Dict[str, str]:
+        """`DEMO_SERVER_CACHE_*` variables for Redis at `url`, or for the in-process fallback."""
+        if url:
+            env = {
+                'DEMO_SERVER_CACHE_BACKEND': 'redis',
+                'DEMO_SERVER_CACHE_URL': url,
+                'DEMO_SERVER_CACHE_EVICTION_POLICY': self.eviction_policy,
+            }
+            if self.max_memory_mb:
+                env['DEMO_SERVER_CACHE_MAX_MEMORY'] = str(self.max_memory_mb * 2**20)
+        elif self.lru_size:
+            env = {
+                'DEMO_SERVER_CACHE_BACKEND': 'memory',
+                'DEMO_SERVER_CACHE_LRU_SIZE': str(self.lru_size),
+            }
+        else:
+            return {}
+        env['DEMO_SERVER_CACHE_TTL'] = str(self.ttl)
+        return env
@@ -0,0 +1,33 @@
+"""
+Rolling restart locks shared over the peer relation.
+
+A unit that needs a restart writes `{"state": "requested"}` under the `restart` key of its own
+peer data bucket. The leader grants locks by listing unit names under `restart_grants` in the
+application bucket, never to more than `max-concurrent-restarts` units at a time. A unit with a
+lock restarts (state becomes "restarted"), waits until the workload answers again and then
+clears its state, which frees the lock for the next unit.
+"""
+from typing import Dict, List
+
+REQUESTED = 'requested'
+RESTARTED = 'restarted'
+
+
+def unit_number(unit_name: str) -> int:
+    """The number of a unit name such as `demo-api-charm/3`."""
+    return int(unit_name.rpartition('/')[2])
+
+
+def grant(requests: Dict[str, str], granted: List[str], max_concurrent: int) -> List[str]:
+    """
+    The units that hold a lock after this round: every granted unit that has not released its
+    lock yet, plus waiting units in unit-number order until `max_concurrent` locks are held.
+    Grants of units that left the relation are dropped.
+    """
+    active = [unit for unit in granted if requests.get(unit) in (REQUESTED, RESTARTED)]
+    waiting = sorted(
+        (unit for unit, state in requests.items() if state == REQUESTED and unit not in active),
+        key=unit_number,
+    )
+    slots = max(0, max_concurrent - len(active))
+    return active + waiting[:slots]
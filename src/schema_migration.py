@@ -0,0 +1,38 @@
+"""
+Leader-only schema migration and per-unit warm-up.
+
+Without coordination every unit starts the server as soon as the database is available, and
+they all race to initialise the schema and to fill their connection pools. Instead the leader
+runs the configured migration command once, in its workload container, and publishes the
+schema revision it reached in the application peer bucket. The revision is keyed by the command
+and the database it ran against, as the provider advertises it to the whole application (not the
+endpoint or pooler a unit connects through), and other units only start the service once the
+published key matches theirs. After a (re)start each unit sends a short burst of requests (with the
+run-load-test script) to warm its pools and caches before it reports Active.
+"""
+import hashlib
+import json
+from typing import Any, Mapping
+
+# Printed revision used when the migration command prints nothing.
+UNKNOWN_REVISION = 'unknown'
+
+
+def migration_key(command: str, endpoints: str, name: str) -> str:
+    """
+    Identifies a migration: the command and the database it runs against, given by the
+    `endpoints` the provider advertises (as published, not reordered by any unit) and its `name`.
+    """
+    target = {'command': command, 'endpoints': endpoints, 'name': name}
+    return hashlib.sha256(json.dumps(target, sort_keys=True).encode()).hexdigest()
+
+
+def parse_revision(stdout: str) -> str:
+    """The schema revision, which the migration command prints as its last line of output."""
+    lines = [line.strip() for line in stdout.splitlines() if line.strip()]
+    return lines[-1] if lines else UNKNOWN_REVISION
+
+
+def warmed_up(summary: Mapping[str, Any]) -> bool:
+    """Whether a warm-up run got answers to all of its requests."""
+    return bool(summary.get('requests')) and not summary.get('errors')
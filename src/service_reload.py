@@ -0,0 +1,54 @@
+"""
+Deciding between a graceful reload and a full restart of the FastAPI service.
+
+Database credentials, endpoints and pool sizes can be handed to a running workload: the charm
+writes them to a settings file in the container and sends SIGHUP, on which uvicorn's supervisor
+replaces its workers one at a time and each new worker reads the file on start. Anything else
+in the service definition (command, other environment) still needs a restart.
+"""
+import shlex
+from typing import Any, Dict, Mapping, Optional, Set
+
+CHANGE_MODES = ('restart', 'reload')
+
+SETTINGS_FILE = '/etc/demo-server/settings.env'
+# Environment variables the workload re-reads from SETTINGS_FILE when its workers are replaced.
+RELOADABLE_PREFIX = 'DEMO_SERVER_DB_'
+
+
+def changed_fields(current: Mapping[str, Any], desired: Mapping[str, Any]) -> Set[str]:
+    """
+    Names of the service fields that differ; environment variables are reported individually
+    as `environment.<NAME>`.
+    """
+    changed = set()
+    for field in set(current) | set(desired):
+        if field == 'environment':
+            env_current = current.get(field) or {}
+            env_desired = desired.get(field) or {}
+            for name in set(env_current) | set(env_desired):
+                if env_current.get(name) != env_desired.get(name):
+                    changed.add(f'environment.{name}')
+        elif current.get(field) != desired.get(field):
+            changed.add(field)
+    return changed
+
+
+def can_reload(current: Mapping[str, Any], desired: Mapping[str, Any]) -> bool:
+    """True if the service exists and only reloadable environment variables changed."""
+    if not current:
+        return False
+    changed = changed_fields(current, desired)
+    return bool(changed) and all(
+        field.startswith(f'environment.{RELOADABLE_PREFIX}') for field in changed
+    )
+
+
+def render_settings(environment: Mapping[str, Optional[str]]) -> str:
+    """The reloadable variables as shell-quoted `NAME=value` lines, in a stable order."""
+    settings: Dict[str, str] = {
+        name: value
+        for name, value in environment.items()
+        if name.startswith(RELOADABLE_PREFIX) and value is not None
+    }
+    return ''.join(f'{name}={shlex.quote(value)}\n' for name, value in sorted(settings.items()))
@@ -0,0 +1,52 @@
+"""
+Reuse of the unit status on update-status while nothing changed.
+
+A full status evaluation looks up the database relations, reads their data and asks Pebble for
+the service, on every update-status of every unit, even when nothing happened for hours. After a
+full evaluation on update-status the charm records the status with a fingerprint of its inputs
+that are cheap to read: config, the state the charm applied, its own restart and recycle data,
+and the state of the Pebble checks. Every other hook is triggered by a change, so it only drops
+the snapshot and evaluates fully. On update-status an Active status is reused while the
+fingerprint matches, so real failures still show up through the checks, and a full evaluation
+(with the version probe and warm-up) runs at least every `status-evaluation-interval` seconds.
+"""
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from typing import Any, Mapping, Optional
+
+
+def fingerprint(inputs: Mapping[str, Any]) -> str:
+    """A stable hash of the status inputs."""
+    encoded = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """The status of the last full evaluation, and what it was computed from."""
+
+    name: str
+    message: str
+    fingerprint: str
+    evaluated_at: float
+
+    @classmethod
+    def from_json(cls, value: str) -> Optional['StatusSnapshot']:
+        """The snapshot kept in `StoredState`, or None if there is none."""
+        data = json.loads(value or '{}')
+        return cls(**data) if data else None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+    def fresh(self, now: float, interval: int) -> bool:
+        """Whether the last full evaluation is less than `interval` seconds old (0 never is)."""
+        return 0 <= now - self.evaluated_at < interval
+
+    def reusable(self, fingerprint: str, now: float, interval: int) -> bool:
+        """
+        Whether the status may be reported again: it is Active, its inputs are unchanged and the
+        last full evaluation is `fresh`.
+        """
+        return self.name == 'active' and self.fingerprint == fingerprint and self.fresh(now, interval)
@@ -0,0 +1,107 @@
+"""
+Uvicorn process-model options, validated from charm config and rendered into the service command.
+
+Options that equal uvicorn's own defaults are left off the command line, so the default Pebble
+layer (and therefore the restart decision in the charm) does not change when they are not set.
+"""
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Mapping, Optional, Union
+
+LOOPS = ('auto', 'asyncio', 'uvloop')
+HTTP_PARSERS = ('auto', 'h11', 'httptools')
+
+# Uvicorn's defaults for the numeric options.
+DEFAULT_BACKLOG = 2048
+DEFAULT_TIMEOUT_KEEP_ALIVE = 5
+
+# Where the workload container's CPU quota can be read (cgroup v2, then v1).
+CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_CPU_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_CPU_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+@dataclass(frozen=True)
+class UvicornOptions:
+    """Validated uvicorn options; `workers` is None when it should follow the CPU limit."""
+
+    workers: Optional[int] = 1
+    loop: str = 'auto'
+    http: str = 'auto'
+    backlog: int = DEFAULT_BACKLOG
+    timeout_keep_alive: int = DEFAULT_TIMEOUT_KEEP_ALIVE
+    limit_concurrency: int = 0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Union[bool, int, float, str]]) -> 'UvicornOptions':
+        """Build the options from charm config, raising ValueError on an invalid value."""
+        workers = str(config['workers']).strip().lower()
+        if workers == 'auto':
+            worker_count = None
+        elif workers.isdigit() and int(workers) > 0:
+            worker_count = int(workers)
+        else:
+            raise ValueError("workers must be a positive integer or 'auto'")
+        if config['loop'] not in LOOPS:
+            raise ValueError(f"loop must be one of {', '.join(LOOPS)}")
+        if config['http'] not in HTTP_PARSERS:
+            raise ValueError(f"http must be one of {', '.join(HTTP_PARSERS)}")
+        for key in ('backlog', 'timeout-keep-alive'):
+            if int(config[key]) < 1:
+                raise ValueError(f'{key} must be a positive integer')
+        if int(config['limit-concurrency']) < 0:
+            raise ValueError('limit-concurrency must be 0 (unlimited) or a positive integer')
+        return cls(
+            workers=worker_count,
+            loop=str(config['loop']),
+            http=str(config['http']),
+            backlog=int(config['backlog']),
+            timeout_keep_alive=int(config['timeout-keep-alive']),
+            limit_concurrency=int(config['limit-concurrency']),
+        )
+
+    def worker_count(self, cpu_limit: Optional[float] = None) -> int:
+        """The number of workers, resolving `workers='auto'` against `cpu_limit`."""
+        return self.workers if self.workers is not None else workers_for_cpus(cpu_limit)
+
+    def args(self, cpu_limit: Optional[float] = None) -> List[str]:
+        """Command-line arguments for uvicorn; `cpu_limit` resolves `workers='auto'`."""
+        workers = self.worker_count(cpu_limit)
+        args = []
+        if workers != 1:
+            args.append(f'--workers={workers}')
+        if self.loop != 'auto':
+            args.append(f'--loop={self.loop}')
+        if self.http != 'auto':
+            args.append(f'--http={self.http}')
+        if self.backlog != DEFAULT_BACKLOG:
+            args.append(f'--backlog={self.backlog}')
+        if self.timeout_keep_alive != DEFAULT_TIMEOUT_KEEP_ALIVE:
+            args.append(f'--timeout-keep-alive={self.timeout_keep_alive}')
+        if self.limit_concurrency:
+            args.append(f'--limit-concurrency={self.limit_concurrency}')
+        return args
+
+
+def workers_for_cpus(cpu_limit: Optional[float]) -> int:
+    """One worker per whole CPU of the limit, or per CPU of the node if there is no limit."""
+    if cpu_limit is None:
+        return os.cpu_count() or 1
+    return max(1, math.floor(cpu_limit))
+
+
+def parse_cpu_max(content: str) -> Optional[float]:
+    """Parse a cgroup v2 `cpu.max` file ("<quota> <period>" or "max <period>") into CPUs."""
+    quota, _, period = content.strip().partition(' ')
+    if quota == 'max':
+        return None
+    return parse_cfs_quota(quota, period or '100000')
+
+
+def parse_cfs_quota(quota: str, period: str) -> Optional[float]:
+    """Turn a cgroup CFS quota and period (in microseconds) into CPUs; a negative quota is unlimited."""
+    quota_us, period_us = int(quota), int(period)
+    if quota_us <= 0 or period_us <= 0:
+        return None
+    return quota_us / period_us
@@ -0,0 +1,106 @@
+"""
+Recycling of long-running uvicorn workers, and Pebble's restart backoff.
+
+Workers that run for days can grow until the pod is OOM-killed, failing every in-flight request
+at once. Two guards replace them gracefully first. `--limit-max-requests` retires a worker after
+a number of requests; uvicorn has no jitter option, so each unit gets a stable offset of up to
+`max-requests-jitter` requests, which spreads recycles over the units. Workers of one unit share
+the same limit, and as uvicorn balances requests evenly they are replaced at about the same
+moment; the offset does not spread recycles within a unit. The charm also checks the
+container's resident memory on update-status and recycles the workers once it passes a soft
+threshold (see `FastAPIDemoCharm._check_memory`).
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Union
+
+from health_checks import pebble_duration
+
+# Memory statistics of the workload container (cgroup v2, then v1).
+CGROUP_V2_MEMORY_STAT = '/sys/fs/cgroup/memory.stat'
+CGROUP_V1_MEMORY_STAT = '/sys/fs/cgroup/memory/memory.stat'
+# Resident (anonymous) memory in those files; page cache is left out as the kernel reclaims it.
+RSS_KEYS = ('anon', 'total_rss', 'rss')
+
+
+def jitter_offset(unit_name: str, jitter: int) -> int:
+    """A stable offset between 0 and `jitter` for the unit."""
+    digest = hashlib.sha256(unit_name.encode()).hexdigest()
+    return int(digest[:8], 16) % (jitter + 1)
+
+
+def parse_memory_stat(content: str) -> Optional[int]:
+    """Resident memory in bytes from a cgroup `memory.stat` file, or None if it is not listed."""
+    stats = dict(line.split(maxsplit=1) for line in content.splitlines() if ' ' in line)
+    for key in RSS_KEYS:
+        if key in stats:
+            return int(stats[key])
+    return None
+
+
+@dataclass(frozen=True)
+class RecycleOptions:
+    """Validated worker recycling and restart backoff options; 0 means not set."""
+
+    max_requests: int = 0
+    max_requests_jitter: int = 0
+    memory_threshold_mb: int = 0
+    backoff_delay: int = 0
+    backoff_factor: float = 0.0
+    backoff_limit: int = 0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Union[bool, int, float, str]]) -> 'RecycleOptions':
+        """Build the options from charm config, raising ValueError on an invalid value."""
+        for key in (
+            'max-requests',
+            'max-requests-jitter',
+            'memory-recycle-threshold-mb',
+            'backoff-delay',
+            'backoff-limit',
+        ):
+            if int(config[key]) < 0:
+                raise ValueError(f'{key} must not be negative')
+        backoff_factor = float(config['backoff-factor'])
+        if backoff_factor and backoff_factor < 1:
+            raise ValueError('backoff-factor must be 0 (Pebble default) or at least 1')
+        return cls(
+            max_requests=int(config['max-requests']),
+            max_requests_jitter=int(config['max-requests-jitter']),
+            memory_threshold_mb=int(config['memory-recycle-threshold-mb']),
+            backoff_delay=int(config['backoff-delay']),
+            backoff_factor=backoff_factor,
+            backoff_limit=int(config['backoff-limit']),
+        )
+
+    def uvicorn_args(self, unit_name: str) -> List[str]:
+        """Uvicorn arguments retiring each worker after this unit's share of requests."""
+        if not self.max_requests:
+            return []
+        limit = self.max_requests + jitter_offset(unit_name, self.max_requests_jitter)
+        return [f'--limit-max-requests={limit}']
+
+    def service_fields(self) -> Dict[str, Union[str, float]]:
+        """Backoff fields of the Pebble service, for the options that are set."""
+        fields: Dict[str, Union[str, float]] = {}
+        if self.backoff_delay:
+            fields['backoff-delay'] = pebble_duration(self.backoff_delay)
+        if self.backoff_factor:
+            fields['backoff-factor'] = self.backoff_factor
+        if self.backoff_limit:
+            fields['backoff-limit'] = pebble_duration(self.backoff_limit)
+        return fields
+
+    def over_threshold(self, rss: Optional[int]) -> bool:
+        """Whether resident memory passed the soft threshold, if one is set."""
+        return bool(self.memory_threshold_mb and rss and rss > self.memory_threshold_mb * 2**20)
+
+
+def describe(recycles: Mapping[str, object]) -> Optional[str]:
+    """A short status note on memory recycles so far, or None if there were none."""
+    count = int(str(recycles.get('count', 0)))
+    if not count:
+        return None
+    last_mb = int(str(recycles.get('last_rss', 0))) // 2**20
+    return f'{count} memory recycle(s), last at {last_mb} MiB'
+
@@ -0,0 +1,128 @@
+"""
+Where and how much the FastAPI workload logs.
+
+By default the app writes its database interaction log to a file in the container's overlay
+filesystem and to stdout, which Pebble also keeps. Under load that is several synchronous
+writes per request. The file can instead go to the `logs` storage mount (a volume, or tmpfs,
+whose size caps the rotated files; without the optional storage it stays in the container
+filesystem) or be turned off, and Pebble can forward stdout to Loki in
+batches through log targets. Options left at their defaults add nothing to the Pebble layer.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+import ops
+
+LEVELS = ('debug', 'info', 'warning', 'error', 'critical')
+DESTINATIONS = ('file', 'storage', 'off')
+
+# The log file of the 'file' destination, where the app writes when it is not told otherwise.
+DEFAULT_LOG_FILE = '/var/log/demo_server.log'
+# Mount location of the `logs` storage in the workload container (see charmcraft.yaml).
+STORAGE_LOCATION = '/var/log/demo-server'
+STORAGE_LOG_FILE = f'{STORAGE_LOCATION}/demo_server.log'
+
+# Names of the Pebble log targets this charm manages.
+LOG_TARGET_PREFIX = 'loki-'
+
+
+@dataclass(frozen=True)
+class LoggingOptions:
+    """Validated logging options."""
+
+    level: str = 'info'
+    destination: str = 'file'
+    max_mb: int = 10
+    backup_count: int = 3
+    access_log: bool = True
+    storage_attached: bool = True
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping[str, Union[bool, int, float, str]], storage_attached: bool = True
+    ) -> 'LoggingOptions':
+        """Build the options from charm config, raising ValueError on an invalid value."""
+        level = str(config['log-level']).lower()
+        if level not in LEVELS:
+            raise ValueError(f"log-level must be one of {', '.join(LEVELS)}")
+        if config['log-destination'] not in DESTINATIONS:
+            raise ValueError(f"log-destination must be one of {', '.join(DESTINATIONS)}")
+        if int(config['log-max-mb']) < 1:
+            raise ValueError('log-max-mb must be a positive integer')
+        if int(config['log-backup-count']) < 0:
+            raise ValueError('log-backup-count must not be negative')
+        return cls(
+            level=level,
+            destination=str(config['log-destination']),
+            max_mb=int(config['log-max-mb']),
+            backup_count=int(config['log-backup-count']),
+            access_log=bool(config['access-log']),
+            storage_attached=storage_attached,
+        )
+
+    @property
+    def on_storage(self) -> bool:
+        """Whether the app logs to the `logs` storage: asked for, and the storage is attached."""
+        return self.destination == 'storage' and self.storage_attached
+
+    @property
+    def log_file(self) -> Optional[str]:
+        """The file the app logs to, or None if file logging is off."""
+        if self.destination == 'off':
+            return None
+        return STORAGE_LOG_FILE if self.on_storage else DEFAULT_LOG_FILE
+
+    @property
+    def environment(self) -> Dict[str, str]:
+        """`DEMO_SERVER_LOG_*` variables for the options that differ from the app's defaults."""
+        env = {}
+        if self.level != 'info':
+            env['DEMO_SERVER_LOG_LEVEL'] = self.level.upper()
+        if self.destination == 'off':
+            env['DEMO_SERVER_LOG_FILE'] = ''
+        elif self.on_storage:
+            env['DEMO_SERVER_LOG_FILE'] = STORAGE_LOG_FILE
+            env['DEMO_SERVER_LOG_MAX_BYTES'] = str(self.max_mb * 2**20)
+            env['DEMO_SERVER_LOG_BACKUP_COUNT'] = str(self.backup_count)
+        return env
+
+    def uvicorn_args(self) -> List[str]:
+        """Uvicorn arguments for its own (and the per-request access) logging."""
+        args = []
+        if self.level != 'info':
+            args.append(f'--log-level={self.level}')
+        if not self.access_log:
+            args.append('--no-access-log')
+        return args
+
+
+def log_targets(
+    urls: Sequence[str], services: Sequence[str], labels: Mapping[str, str]
+) -> Dict[str, ops.pebble.LogTargetDict]:
+    """Pebble log targets that forward the given services' output to each Loki push URL."""
+    return {
+        f'{LOG_TARGET_PREFIX}{index}': {
+            'override': 'replace',
+            'type': 'loki',
+            'location': url,
+            'services': list(services),
+            'labels': dict(labels),
+        }
+        for index, url in enumerate(sorted(urls))
+    }
+
+
+def stale_log_targets(
+    current: Mapping[str, Mapping[str, Any]], desired: Mapping[str, Any]
+) -> Dict[str, ops.pebble.LogTargetDict]:
+    """
+    Layer entries that stop forwarding for targets this charm added earlier but no longer wants
+    (Pebble cannot delete a log target, only take every service off it).
+    """
+    return {
+        name: {'override': 'merge', 'services': ['-all']}
+        for name, target in current.items()
+        if name.startswith(LOG_TARGET_PREFIX)
+        and name not in desired
+        and '-all' not in (target.get('services') or [])
+    }
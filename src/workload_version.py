@@ -0,0 +1,65 @@
+"""
+Workload version discovery.
+
+The FastAPI server reports its version on `/version`. Right after a (re)start uvicorn is not
+listening yet, so the probe uses short timeouts and a few bounded retries that first wait for
+Pebble to report the service as running, instead of one long blocking request.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a TCP connection and for the response, per attempt.
+CONNECT_TIMEOUT = 0.5
+READ_TIMEOUT = 2.0
+# Delays before the second and later attempts; the first attempt is immediate.
+RETRY_DELAYS = (0.5, 1.0)
+
+# Custom notice the workload (or an operator) can record with `pebble notify` once it serves.
+READY_NOTICE = 'canonical.com/api-demo-server/ready'
+
+
+class VersionProbe:
+    """Ask the workload for its version with a bounded number of quick attempts."""
+
+    def __init__(
+        self,
+        port: int,
+        is_ready: Callable[[], bool],
+        retry_delays: Sequence[float] = RETRY_DELAYS,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.url = f'http://localhost:{port}/version'
+        self._is_ready = is_ready
+        self._retry_delays = retry_delays
+        self._sleep = sleep
+
+    def probe(self) -> Optional[str]:
+        """Return the workload version, or None if it did not answer within the retry budget."""
+        # Imported here: requests (urllib3, charset detection, ssl) is only needed by the hooks
+        # that actually probe, and most dispatches do not.
+        import requests
+
+        for delay in (0.0, *self._retry_delays):
+            if delay:
+                self._sleep(delay)
+            if not self._is_ready():
+                logger.debug('Service is not running yet, skipping version request')
+                continue
+            try:
+                resp = requests.get(self.url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                resp.raise_for_status()
+                return str(resp.json()['version'])
+            except (requests.RequestException, ValueError, KeyError) as e:
+                logger.debug('Version request to %s failed: %s', self.url, e)
+        return None
+
+
+def fingerprint(services: Dict[str, Any]) -> str:
+    """A stable hash of a Pebble plan's services, used to tell when the version may have changed."""
+    encoded = json.dumps(services, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
@@ -0,0 +1,211 @@
+"""
+Hook cost benchmarks for FastAPIDemoCharm, driven through Scenario.
+
+Each case runs one event with 1, 10 or 100 peer units and small or large relation data, and
+records wall time, hook-tool calls, Pebble API calls and peak Python memory. Calls are counted
+on the model backend and Pebble client Scenario stands in with, so they include those of ops
+and the charm libraries, not only the ones the charm measures itself (juju-log is left out).
+The results are compared with `baseline.json`: call counts must not grow at all, while wall
+time and memory may grow by the factors under `thresholds` (they are noisy). A case missing
+from the baseline is skipped until it is recorded. 'update-status-idle' measures the second of
+two update-status runs, which reuses the status of the first (see `status_cache`).
+
+Run with `tox -e benchmark`. To accept the current numbers as the new baseline, run
+`BENCHMARK_UPDATE_BASELINE=1 tox -e benchmark` and commit the updated `baseline.json`.
+"""
+import collections
+import functools
+import inspect
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Counter, Dict, List
+
+import ops
+import pytest
+import scenario
+from scenario.mocking import _MockModelBackend, _MockPebbleClient
+
+from charm import FastAPIDemoCharm
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+RESULTS: Dict[str, Dict[str, float]] = {}
+
+pytestmark = pytest.mark.usefixtures('k8s_resources_patch')
+
+PEER_COUNTS = (1, 10, 100)
+DATA_SIZES = ('small', 'large')
+EVENTS = (
+    'config-changed',
+    'pebble-ready',
+    'database-created',
+    'endpoints-changed',
+    'start',
+    'update-status',
+    'update-status-idle',
+)
+
+
+# Backend methods that do not stand for a hook tool, or whose calls depend on the log level.
+UNCOUNTED = {'get_pebble', 'juju_log'}
+
+
+@pytest.fixture
+def calls(monkeypatch: pytest.MonkeyPatch) -> Counter[str]:
+    """
+    Count the calls on Scenario's model backend (one per hook tool run) and Pebble client (one
+    per API request). Calls the mocks make on themselves are not counted again.
+    """
+    counts: Counter[str] = collections.Counter()
+    depth = [0]
+
+    def counted(method: Callable[..., Any], metric: str) -> Callable[..., Any]:
+        @functools.wraps(method)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not depth[0]:
+                counts[metric] += 1
+            depth[0] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+
+        return wrapper
+
+    mocks = ((_MockModelBackend, 'hook_tool_calls'), (_MockPebbleClient, 'pebble_calls'))
+    for cls, metric in mocks:
+        for name, method in inspect.getmembers(cls, inspect.isfunction):
+            if not name.startswith('_') and name not in UNCOUNTED:
+                monkeypatch.setattr(cls, name, counted(method, metric))
+    return counts
+
+
+def database_data(size: str) -> Dict[str, str]:
+    data = {
+        'endpoints': '10.0.0.1:5432',
+        'username': 'foo',
+        'password': 'bar',
+        'database': 'names_db',
+    }
+    if size == 'large':
+        data['read-only-endpoints'] = ','.join(f'10.0.1.{n}:5432' for n in range(50))
+        data['tls-ca'] = 'x' * 16384
+    return data
+
+
+def build_state(event: str, peers: int, size: str) -> scenario.State:
+    remote_data = database_data(size)
+    local_unit_data = {}
+    if event == 'endpoints-changed':
+        # The library compares with what it saw last time to tell created from changed.
+        local_unit_data['data'] = json.dumps({**remote_data, 'endpoints': '10.0.0.9:5432'})
+    database = scenario.Relation(
+        endpoint='database',
+        interface='postgresql_client',
+        remote_app_name='postgresql-k8s',
+        local_unit_data=local_unit_data,
+        remote_app_data=remote_data,
+    )
+    peer_payload = {'unit_stats': json.dumps({'started_counter': 3})}
+    if size == 'large':
+        peer_payload['padding'] = 'x' * 4096
+    peer_relation = scenario.PeerRelation(
+        endpoint='fastapi-peer',
+        local_unit_data=dict(peer_payload),
+        peers_data={n: dict(peer_payload) for n in range(1, peers)},
+    )
+    container = scenario.Container(name='demo-server', can_connect=True)
+    if event.startswith('update-status'):
+        # A running workload, so that the unit goes Active.
+        layer = ops.pebble.Layer(
+            {'services': {'fastapi-service': {'override': 'replace', 'command': 'uvicorn'}}}
+        )
+        container = scenario.Container(
+            name='demo-server',
+            can_connect=True,
+            layers={'fastapi_demo': layer},
+            service_statuses={'fastapi-service': ops.pebble.ServiceStatus.ACTIVE},
+        )
+    return scenario.State(
+        leader=True,
+        relations=[database, peer_relation],
+        containers=[container],
+    )
+
+
+def run_event(ctx: scenario.Context, event: str, state: scenario.State) -> scenario.State:
+    database = state.get_relations('database')[0]
+    if event == 'config-changed':
+        return ctx.run(ctx.on.config_changed(), state)
+    if event == 'pebble-ready':
+        return ctx.run(ctx.on.pebble_ready(state.get_container('demo-server')), state)
+    if event in ('database-created', 'endpoints-changed'):
+        return ctx.run(ctx.on.relation_changed(database, remote_unit=0), state)
+    if event == 'start':
+        return ctx.run(ctx.on.start(), state)
+    # Evaluates the status in full, or reuses it on 'update-status-idle'.
+    return ctx.run(ctx.on.update_status(), state)
+
+
+@pytest.mark.parametrize('size', DATA_SIZES)
+@pytest.mark.parametrize('peers', PEER_COUNTS)
+@pytest.mark.parametrize('event', EVENTS)
+def test_hook_cost(
+    monkeypatch: pytest.MonkeyPatch, calls: Counter[str], event: str, peers: int, size: str
+):
+    monkeypatch.setattr(FastAPIDemoCharm, 'version', '1.0.1')
+    ctx = scenario.Context(FastAPIDemoCharm)
+    state = build_state(event, peers, size)
+    if event == 'update-status-idle':
+        # The first update-status evaluates in full; the measured one reuses its status.
+        state = ctx.run(ctx.on.update_status(), state)
+
+    calls.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    run_event(ctx, event, state)
+    wall_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    case = f'{event}/{peers}-peers/{size}'
+    result = {
+        'wall_ms': round(wall_ms, 3),
+        'hook_tool_calls': calls['hook_tool_calls'],
+        'pebble_calls': calls['pebble_calls'],
+        'peak_kib': round(peak / 1024, 1),
+    }
+    RESULTS[case] = result
+    check_regression(case, result)
+
+
+def load_baseline() -> Dict[str, Any]:
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def check_regression(case: str, result: Dict[str, float]) -> None:
+    if os.environ.get('BENCHMARK_UPDATE_BASELINE'):
+        return
+    baseline = load_baseline()
+    expected = baseline['cases'].get(case)
+    if expected is None:
+        pytest.skip(f'{case} has no baseline; record it with BENCHMARK_UPDATE_BASELINE=1')
+    failures: List[str] = []
+    for metric, factor in baseline['thresholds'].items():
+        limit = expected[metric] * factor
+        if result[metric] > limit:
+            failures.append(f'{metric} {result[metric]} > {limit} (baseline {expected[metric]})')
+    assert not failures, f'{case} regressed: ' + '; '.join(failures)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def save_results():
+    """Print every case and, if asked to, store them as the new baseline."""
+    yield
+    print(json.dumps(RESULTS, indent=2, sort_keys=True))
+    if os.environ.get('BENCHMARK_UPDATE_BASELINE') and RESULTS:
+        baseline = load_baseline()
+        baseline['cases'].update(RESULTS)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
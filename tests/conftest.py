@@ -0,0 +1,15 @@
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.fixture
+def k8s_resources_patch():
+    """The pod resource patcher reads the namespace and calls the Kubernetes API; skip both."""
+    with patch.multiple(
+        'charms.observability_libs.v0.kubernetes_compute_resources_patch.'
+        'KubernetesComputeResourcesPatch',
+        _namespace='test-namespace',
+        _patch=lambda *args, **kwargs: None,
+    ):
+        yield
@@ -46,7 +46,7 @@ async def test_database_integration(ops_test: OpsTest):
         entity_url='postgresql-k8s',
         channel='14/stable',
     )
-    await ops_test.model.integrate(f'{APP_NAME}', 'postgresql-k8s')
+    await ops_test.model.integrate(f'{APP_NAME}:database', 'postgresql-k8s')
     await ops_test.model.wait_for_idle(
         apps=[APP_NAME], status='active', raise_on_blocked=False, timeout=120
     )
@@ -73,3 +73,27 @@ async def test_open_ports(ops_test: OpsTest):
     await app.set_config({'server-port': '6789'})
     (await ops_test.model.wait_for_idle(apps=[APP_NAME], status='active', timeout=120),)
     assert is_port_open(address, 6789)
+
+
+@pytest.mark.abort_on_fail
+async def test_pooler_integration(ops_test: OpsTest):
+    """Verify that the charm connects through PgBouncer once it is integrated.
+
+    Assert that the charm stays active and reports the pooler path in get-db-info.
+    """
+    await ops_test.model.deploy(
+        application_name='pgbouncer-k8s',
+        entity_url='pgbouncer-k8s',
+        channel='1/stable',
+        trust=True,
+    )
+    await ops_test.model.integrate('pgbouncer-k8s', 'postgresql-k8s')
+    await ops_test.model.integrate(f'{APP_NAME}:database-pooler', 'pgbouncer-k8s')
+    await ops_test.model.wait_for_idle(
+        apps=[APP_NAME, 'pgbouncer-k8s'], status='active', raise_on_blocked=False, timeout=300
+    )
+
+    unit = ops_test.model.applications[APP_NAME].units[0]
+    action = await unit.run_action('get-db-info')
+    result = await action.wait()
+    assert result.results['db-path'] == 'pooler'
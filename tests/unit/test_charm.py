@@ -6,7 +6,7 @@ from charm import FastAPIDemoCharm
 
 # This is aparently a legacy unit testing mechanism, deprecated since version 2.17
 @pytest.fixture
-def harness():
+def harness(k8s_resources_patch):
     harness = ops.testing.Harness(FastAPIDemoCharm)
     harness.begin()
     yield harness
@@ -27,8 +27,27 @@ def test_pebble_layer(
                 'startup': 'enabled',
                 # Since the environment is empty, Layer.to_dict() will not
                 # include it.
+                'on-check-failure': {'fastapi-live': 'restart'},
             }
-        }
+        },
+        'checks': {
+            'fastapi-live': {
+                'override': 'replace',
+                'level': 'alive',
+                'period': '10s',
+                'timeout': '3s',
+                'threshold': 3,
+                'tcp': {'port': 8000},
+            },
+            'fastapi-ready': {
+                'override': 'replace',
+                'level': 'ready',
+                'period': '10s',
+                'timeout': '3s',
+                'threshold': 3,
+                'http': {'url': 'http://localhost:8000/'},
+            },
+        },
     }
 
     # Simulate the container coming up and emission of pebble-ready event
@@ -74,3 +93,80 @@ def test_port_configuration(
     else:
         assert server_port_config in port_numbers
     assert unit_status == expected_status
+
+
+def test_uvicorn_options_in_pebble_layer(
+    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness[FastAPIDemoCharm]
+):
+    monkeypatch.setattr(FastAPIDemoCharm, 'version', '1.0.1')
+    harness.container_pebble_ready('demo-server')
+    # When
+    harness.update_config({'workers': '4', 'loop': 'uvloop', 'http': 'httptools'})
+    harness.evaluate_status()
+    # Then
+    command = harness.get_container_pebble_plan('demo-server').services['fastapi-service'].command
+    assert command == (
+        'uvicorn api_demo_server.app:app --host=0.0.0.0 --port=8000'
+        ' --workers=4 --loop=uvloop --http=httptools'
+    )
+
+
+def test_invalid_uvicorn_options_block(
+    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness[FastAPIDemoCharm]
+):
+    monkeypatch.setattr(FastAPIDemoCharm, 'version', '1.0.1')
+    harness.container_pebble_ready('demo-server')
+    # When
+    harness.update_config({'workers': 'many'})
+    harness.evaluate_status()
+    # Then
+    assert harness.model.unit.status == ops.BlockedStatus(
+        "Invalid config: workers must be a positive integer or 'auto'"
+    )
+
+
+def test_check_timeout_must_be_below_period(
+    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness[FastAPIDemoCharm]
+):
+    monkeypatch.setattr(FastAPIDemoCharm, 'version', '1.0.1')
+    harness.container_pebble_ready('demo-server')
+    # When
+    harness.update_config({'check-period': 5, 'check-timeout': 5})
+    harness.evaluate_status()
+    # Then
+    assert harness.model.unit.status == ops.BlockedStatus(
+        'Invalid config: check-timeout must be less than check-period'
+    )
+
+
+def test_cpu_limit_sizes_auto_workers_and_is_exported(
+    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness[FastAPIDemoCharm]
+):
+    monkeypatch.setattr(FastAPIDemoCharm, 'version', '1.0.1')
+    harness.container_pebble_ready('demo-server')
+    # When
+    harness.update_config({'workers': 'auto', 'cpu-limit': '2', 'memory-limit': '1Gi'})
+    # Then
+    service = harness.get_container_pebble_plan('demo-server').services['fastapi-service']
+    assert '--workers=2' in service.command
+    assert service.environment['DEMO_SERVER_CPU_LIMIT'] == '2.0'
+    assert service.environment['DEMO_SERVER_MEMORY_REQUEST'] == str(2**30)
+    assert harness.charm._resource_requirements().requests == {'cpu': '2', 'memory': '1Gi'}
+
+
+def test_invalid_resources_block(
+    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness[FastAPIDemoCharm]
+):
+    monkeypatch.setattr(FastAPIDemoCharm, 'version', '1.0.1')
+    harness.container_pebble_ready('demo-server')
+    harness.update_config({'cpu-limit': '2'})
+    assert harness.charm._resource_requirements().limits == {'cpu': '2'}
+    # When
+    harness.update_config({'cpu-request': '4'})
+    harness.evaluate_status()
+    # Then
+    assert harness.model.unit.status == ops.BlockedStatus(
+        'Invalid config: cpu-request must not exceed cpu-limit'
+    )
+    # The pod keeps the last valid resources.
+    assert harness.charm._resource_requirements().limits == {'cpu': '2'}
@@ -0,0 +1,69 @@
+import pytest
+
+from compute_resources import ComputeResources, parse_cpu, parse_memory
+
+UNSET = {'cpu-request': '', 'cpu-limit': '', 'memory-request': '', 'memory-limit': ''}
+
+
+@pytest.mark.parametrize('quantity,cores', [('2', 2.0), ('0.5', 0.5), ('500m', 0.5), ('1500m', 1.5)])
+def test_parse_cpu(quantity, cores):
+    assert parse_cpu(quantity) == cores
+
+
+@pytest.mark.parametrize(
+    'quantity,size', [('1024', 1024), ('512Mi', 512 * 2**20), ('1Gi', 2**30), ('1G', 10**9)]
+)
+def test_parse_memory(quantity, size):
+    assert parse_memory(quantity) == size
+
+
+@pytest.mark.parametrize('quantity', ['', '0', '-1', '2 cores', '1.5.0', 'm'])
+def test_invalid_quantities(quantity):
+    with pytest.raises(ValueError):
+        parse_cpu(quantity)
+    with pytest.raises(ValueError):
+        parse_memory(quantity)
+
+
+def test_unset_adds_nothing():
+    resources = ComputeResources.from_config(UNSET)
+
+    assert (resources.limits, resources.requests) == ({}, {})
+    assert resources.cpu_limit_cores is None
+    assert resources.environment == {}
+
+
+def test_requests_default_to_limits():
+    resources = ComputeResources.from_config({**UNSET, 'cpu-limit': '2', 'memory-limit': '1Gi'})
+
+    assert resources.requests == resources.limits == {'cpu': '2', 'memory': '1Gi'}
+    assert resources.cpu_limit_cores == 2.0
+    assert resources.environment == {
+        'DEMO_SERVER_CPU_REQUEST': '2.0',
+        'DEMO_SERVER_CPU_LIMIT': '2.0',
+        'DEMO_SERVER_MEMORY_REQUEST': str(2**30),
+        'DEMO_SERVER_MEMORY_LIMIT': str(2**30),
+    }
+
+
+def test_lower_requests_kept():
+    resources = ComputeResources.from_config(
+        {**UNSET, 'cpu-request': '500m', 'cpu-limit': '2', 'memory-limit': '1Gi'}
+    )
+
+    assert resources.requests == {'cpu': '500m', 'memory': '1Gi'}
+    assert resources.limits == {'cpu': '2', 'memory': '1Gi'}
+
+
+@pytest.mark.parametrize(
+    'config,message',
+    [
+        ({'cpu-limit': 'lots'}, 'cpu-limit'),
+        ({'memory-request': '1Gb'}, 'memory-request'),
+        ({'cpu-request': '3', 'cpu-limit': '2'}, 'cpu-request must not exceed cpu-limit'),
+        ({'memory-request': '2Gi', 'memory-limit': '1Gi'}, 'memory-request must not exceed'),
+    ],
+)
+def test_invalid_config(config, message):
+    with pytest.raises(ValueError, match=message):
+        ComputeResources.from_config({**UNSET, **config})
@@ -0,0 +1,46 @@
+import pytest
+
+import db_endpoints
+
+
+def test_parse_endpoints():
+    assert db_endpoints.parse_endpoints('10.0.0.1:5432, 10.0.0.2:5433,') == [
+        ('10.0.0.1', '5432'),
+        ('10.0.0.2', '5433'),
+    ]
+    assert db_endpoints.parse_endpoints('') == []
+
+
+def test_dsn_with_several_primaries_targets_read_write():
+    assert (
+        db_endpoints.dsn([('a', '5432')], 'foo', 'p@ss', 'names_db')
+        == 'postgresql://foo:p%40ss@a:5432/names_db'
+    )
+    assert db_endpoints.dsn([('a', '5432'), ('b', '5432')], 'foo', 'bar', 'names_db') == (
+        'postgresql://foo:bar@a:5432,b:5432/names_db?target_session_attrs=read-write'
+    )
+
+
+def test_round_robin_spreads_units_over_replicas():
+    replicas = [('r2', '5432'), ('r1', '5432'), ('r3', '5432')]
+
+    preferred = [
+        db_endpoints.order_replicas(replicas, f'demo-api-charm/{n}', 'round-robin')[0]
+        for n in range(3)
+    ]
+
+    assert preferred == [('r1', '5432'), ('r2', '5432'), ('r3', '5432')]
+
+
+def test_hash_keeps_every_replica_as_fallback():
+    replicas = [('r1', '5432'), ('r2', '5432')]
+
+    ordered = db_endpoints.order_replicas(replicas, 'demo-api-charm/7', 'hash')
+
+    assert sorted(ordered) == replicas
+    assert ordered == db_endpoints.order_replicas(replicas, 'demo-api-charm/7', 'hash')
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        db_endpoints.order_replicas([], 'demo-api-charm/0', 'random')
@@ -0,0 +1,62 @@
+import json
+import socket
+
+import pytest
+
+import db_latency
+
+A, B, C = ('10.0.0.1', '5432'), ('10.0.0.2', '5432'), ('10.0.0.3', '5432')
+
+
+@pytest.fixture
+def listening_port():
+    server = socket.socket()
+    server.bind(('localhost', 0))
+    server.listen()
+    yield server.getsockname()[1]
+    server.close()
+
+
+def test_probe(listening_port):
+    closed = socket.socket()
+    closed.bind(('localhost', 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    results = db_latency.probe([f'localhost:{listening_port}', f'localhost:{closed_port}'])
+
+    assert results[f'localhost:{listening_port}'] >= 0
+    assert results[f'localhost:{closed_port}'] is None
+
+
+def test_main_prints_json(listening_port, capsys):
+    assert db_latency.main([f'localhost:{listening_port}']) == 0
+
+    assert list(json.loads(capsys.readouterr().out)) == [f'localhost:{listening_port}']
+
+
+def test_rank_fastest_reachable_first():
+    rtts = {'10.0.0.1:5432': 5.0, '10.0.0.2:5432': 0.4, '10.0.0.3:5432': None}
+
+    assert db_latency.rank([A, B, C], rtts) == [B, A, C]
+    # Endpoints not probed yet go between reachable and unreachable ones.
+    assert db_latency.rank([C, A], {'10.0.0.3:5432': None}) == [A, C]
+    assert db_latency.rank([A, B], {}) == [A, B]
+
+
+def test_rank_keeps_given_order_within_margin():
+    rtts = {'10.0.0.1:5432': 0.5, '10.0.0.2:5432': 0.4, '10.0.0.3:5432': 3.0}
+
+    assert db_latency.rank([A, B, C], rtts) == [A, B, C]
+    assert db_latency.rank([B, A, C], rtts) == [B, A, C]
+    assert db_latency.rank([C, A, B], rtts) == [A, B, C]
+
+
+def test_rank_keeps_selected_endpoint_within_margin():
+    rtts = {'10.0.0.1:5432': 0.9, '10.0.0.2:5432': 0.4}
+
+    assert db_latency.rank([A, B], rtts, current='10.0.0.1:5432') == [A, B]
+    rtts['10.0.0.1:5432'] = 2.0
+    assert db_latency.rank([A, B], rtts, current='10.0.0.1:5432') == [B, A]
+    rtts['10.0.0.1:5432'] = None
+    assert db_latency.rank([A, B], rtts, current='10.0.0.1:5432') == [B, A]
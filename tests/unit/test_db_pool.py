@@ -0,0 +1,51 @@
+import db_pool
+
+
+def test_budget_is_split_across_units_and_workers():
+    settings = db_pool.pool_settings(
+        max_connections=100, reserved=10, units=3, workers=2, pool_timeout=30
+    )
+
+    # 90 connections over 6 workers gives each worker 15.
+    assert (settings.pool_size, settings.max_overflow) == (11, 4)
+    assert settings.environment == {
+        'DEMO_SERVER_DB_POOL_SIZE': '11',
+        'DEMO_SERVER_DB_MAX_OVERFLOW': '4',
+        'DEMO_SERVER_DB_POOL_TIMEOUT': '30',
+    }
+
+
+def test_total_connections_stay_within_limit_when_scaling_out():
+    for units in (1, 10, 40):
+        settings = db_pool.pool_settings(
+            max_connections=500, reserved=10, units=units, workers=2, pool_timeout=30
+        )
+        assert units * 2 * (settings.pool_size + settings.max_overflow) <= 490
+
+
+def test_small_scale_changes_keep_the_settings():
+    sizes = [db_pool.sizing_units(units) for units in (0, 1, 3, 4, 6, 7)]
+    assert sizes == [3, 3, 3, 6, 6, 9]
+    settings = {
+        db_pool.pool_settings(
+            max_connections=500, reserved=10, units=units, workers=2, pool_timeout=30
+        )
+        for units in (4, 5, 6)
+    }
+
+    assert len(settings) == 1
+
+
+def test_every_worker_keeps_one_connection():
+    settings = db_pool.pool_settings(
+        max_connections=20, reserved=10, units=40, workers=4, pool_timeout=5
+    )
+
+    assert (settings.pool_size, settings.max_overflow) == (1, 0)
+
+
+def test_pooler_environment():
+    assert db_pool.pooler_environment(pool_recycle=60) == {
+        'DEMO_SERVER_DB_PREPARED_STATEMENTS': 'false',
+        'DEMO_SERVER_DB_POOL_RECYCLE': '60',
+    }
@@ -0,0 +1,29 @@
+import pytest
+
+import health_checks
+
+
+@pytest.mark.parametrize(
+    'seconds,expected', [(3, '3s'), (60, '1m0s'), (90, '1m30s'), (3600, '1h0m0s')]
+)
+def test_pebble_duration_matches_plan_format(seconds, expected):
+    assert health_checks.pebble_duration(seconds) == expected
+
+
+def test_layer_checks():
+    checks = health_checks.layer_checks(port=8000, period=10, timeout=3, threshold=3)
+
+    assert checks[health_checks.LIVENESS_CHECK]['level'] == 'alive'
+    assert checks[health_checks.LIVENESS_CHECK]['tcp'] == {'port': 8000}
+    assert checks[health_checks.READINESS_CHECK]['level'] == 'ready'
+    assert checks[health_checks.READINESS_CHECK]['http'] == {'url': 'http://localhost:8000/'}
+
+
+def test_checks_match_ignores_fields_the_charm_does_not_set():
+    desired = health_checks.layer_checks(port=8000, period=10, timeout=3, threshold=3)
+    current = {name: {**check, 'startup': 'enabled'} for name, check in desired.items()}
+
+    assert health_checks.checks_match(current, desired)
+    assert not health_checks.checks_match({}, desired)
+    changed = health_checks.layer_checks(port=8000, period=30, timeout=3, threshold=3)
+    assert not health_checks.checks_match(current, changed)
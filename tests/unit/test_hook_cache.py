@@ -0,0 +1,35 @@
+from unittest.mock import Mock
+
+import pytest
+
+from hook_cache import HookCache
+
+
+def test_value_is_fetched_once_per_dispatch():
+    cache = HookCache()
+    fetch = Mock(return_value={'endpoints': '127.0.0.1:5432'})
+
+    assert cache.get('database', fetch) == {'endpoints': '127.0.0.1:5432'}
+    assert cache.get('database', fetch) == {'endpoints': '127.0.0.1:5432'}
+
+    fetch.assert_called_once()
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'invalidations': 0, 'saved_calls': 1}
+
+
+def test_invalidate_forces_refetch():
+    cache = HookCache()
+    fetch = Mock(side_effect=['plan-1', 'plan-2'])
+
+    assert cache.get('plan', fetch) == 'plan-1'
+    cache.invalidate('plan', 'service')
+    assert cache.get('plan', fetch) == 'plan-2'
+    assert cache.invalidations == 1
+
+
+def test_failed_fetch_is_not_cached():
+    cache = HookCache()
+    fetch = Mock(side_effect=[ConnectionError('pebble not ready'), 'plan'])
+
+    with pytest.raises(ConnectionError):
+        cache.get('plan', fetch)
+    assert cache.get('plan', fetch) == 'plan'
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from typing import Dict
+
+# Cumulative time to import the charm module, including ops and the charm libraries. Generous
+# enough not to flake on a loaded CI runner, tight enough to catch a new heavy dependency.
+IMPORT_BUDGET_US = 1_500_000
+
+# Modules that only specific code paths need and that must not be imported on every dispatch.
+LAZY_MODULES = ('requests', 'urllib3', 'cProfile', 'pstats', 'lightkube', 'httpx')
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module imported by `module`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        env=os.environ,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:') :].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_charm_import_time_within_budget():
+    times = import_times('charm')
+
+    assert times['charm'] < IMPORT_BUDGET_US
+
+
+def test_heavy_modules_are_imported_lazily():
+    times = import_times('charm')
+
+    assert not set(LAZY_MODULES) & set(times)
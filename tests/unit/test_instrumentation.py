@@ -0,0 +1,50 @@
+import os
+
+from instrumentation import HookProfiler, timed
+
+
+class Charm:
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    @timed
+    def _on_config_changed(self, event):
+        return event
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = HookProfiler(enabled=False)
+
+    with profiler.measure('pebble.get_plan'):
+        pass
+
+    assert profiler.summary()['sections'] == {}
+    assert profiler.dump_profile('config-changed') is None
+
+
+def test_timed_handlers_and_sections_are_summarised():
+    profiler = HookProfiler(enabled=True)
+    charm = Charm(profiler)
+
+    assert charm._on_config_changed('event') == 'event'
+    with profiler.measure('pebble.get_plan'):
+        pass
+    with profiler.measure('pebble.get_plan'):
+        pass
+
+    sections = profiler.summary()['sections']
+    assert sections['handler._on_config_changed']['calls'] == 1
+    assert sections['pebble.get_plan']['calls'] == 2
+    assert Charm._on_config_changed.__name__ == '_on_config_changed'
+
+
+def test_cprofile_stats_are_dumped(tmp_path, monkeypatch):
+    monkeypatch.setattr('instrumentation.PROFILE_DIR', str(tmp_path))
+    profiler = HookProfiler(enabled=True, cprofile=True)
+    sorted(range(1000))
+
+    profile = profiler.dump_profile('update-status')
+
+    assert profile is not None
+    assert os.path.exists(profile['path'])
+    assert 'function calls' in profile['top']
@@ -0,0 +1,94 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+import load_test
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 200 if self.path == '/' else 404
+        body = b'{"message": "ok"}'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_port():
+    server = http.server.ThreadingHTTPServer(('localhost', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_percentile_nearest_rank():
+    ordered = [float(i) for i in range(1, 101)]
+
+    assert load_test.percentile(ordered, 0.5) == 50.0
+    assert load_test.percentile(ordered, 0.99) == 99.0
+    assert load_test.percentile([3.0], 0.95) == 3.0
+    assert load_test.percentile([], 0.5) == 0.0
+
+
+def test_summarize():
+    summary = load_test.summarize([0.001, 0.002, 0.004, 0.010], errors=1, elapsed=2.0)
+
+    assert summary['requests'] == 5
+    assert summary['rps'] == 2.5
+    assert summary['error_rate'] == 0.2
+    assert (summary['p50_ms'], summary['max_ms']) == (2.0, 10.0)
+
+
+def test_run_against_local_server(server_port):
+    summary = load_test.run('localhost', server_port, '/', duration=0.3, concurrency=2, rate=0)
+
+    assert summary['requests'] > 0
+    assert summary['errors'] == 0
+    assert 0 < summary['p50_ms'] <= summary['p99_ms'] <= summary['max_ms']
+
+
+def test_error_responses_are_counted(server_port):
+    summary = load_test.run('localhost', server_port, '/missing', duration=0.2, concurrency=1, rate=0)
+
+    assert summary['requests'] == summary['errors'] > 0
+    assert summary['error_rate'] == 1.0
+
+
+def test_rate_limits_requests(server_port):
+    summary = load_test.run('localhost', server_port, '/', duration=0.5, concurrency=2, rate=10)
+
+    assert summary['requests'] <= 7
+
+
+def test_main_prints_json(server_port, capsys):
+    load_test.main([f'--port={server_port}', '--duration=0.1', '--concurrency=1'])
+
+    assert json.loads(capsys.readouterr().out)['requests'] > 0
+
+
+def test_compare_and_action_results():
+    previous = {'rps': 100.0, 'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 0, 'max_ms': 40.0, 'error_rate': 0.01}
+    current = {'rps': 150.0, 'p50_ms': 5.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'max_ms': 30.0, 'error_rate': 0.0}
+
+    assert load_test.compare(previous, current) == {
+        'rps': '+50.0%',
+        'p50_ms': '-50.0%',
+        'p95_ms': '+0.0%',
+        'max_ms': '-25.0%',
+        'error_rate': '-1.00pp',
+    }
+    assert load_test.action_results({'error_rate': 0.0, 'p50_ms': 1.0}) == {
+        'error-rate': 0.0,
+        'p50-ms': 1.0,
+    }
@@ -0,0 +1,31 @@
+from reconcile import DesiredState
+
+LAYER = {
+    'services': {'fastapi-service': {'override': 'replace', 'command': 'uvicorn app:app'}},
+    'checks': {'fastapi-live': {'override': 'replace', 'tcp': {'port': 8000}}},
+}
+
+
+def test_fingerprint_is_stable():
+    reordered = {'checks': LAYER['checks'], 'services': LAYER['services']}
+
+    assert DesiredState(8000, LAYER).fingerprint == DesiredState(8000, reordered).fingerprint
+
+
+def test_fingerprint_changes_with_port_and_layer():
+    changed = {**LAYER, 'services': {'fastapi-service': {'command': 'uvicorn app:app --workers=2'}}}
+
+    fingerprints = {
+        DesiredState(8000, LAYER).fingerprint,
+        DesiredState(8080, LAYER).fingerprint,
+        DesiredState(8000, changed).fingerprint,
+    }
+    assert len(fingerprints) == 3
+
+
+def test_sections():
+    state = DesiredState(8000, LAYER)
+
+    assert state.services == LAYER['services']
+    assert state.checks == LAYER['checks']
+    assert DesiredState(8000, {}).checks == {}
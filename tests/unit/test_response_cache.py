@@ -0,0 +1,62 @@
+import pytest
+
+import response_cache
+from response_cache import CacheOptions
+
+DEFAULTS = {
+    'cache-ttl': 60,
+    'cache-max-memory-mb': 0,
+    'cache-eviction-policy': 'allkeys-lru',
+    'cache-lru-size': 0,
+}
+
+
+def test_redis_url():
+    assert response_cache.redis_url([{}, {'hostname': 'redis-0.redis', 'port': '6380'}]) == (
+        'redis://redis-0.redis:6380/0'
+    )
+    assert response_cache.redis_url([{'host': '10.0.0.5', 'password': 'p@ss/word'}]) == (
+        'redis://:p%40ss%2Fword@10.0.0.5:6379/0'
+    )
+    assert response_cache.redis_url([{}, {'port': '6379'}]) is None
+
+
+def test_defaults_add_nothing():
+    assert CacheOptions.from_config(DEFAULTS).environment(None) == {}
+
+
+def test_redis_environment():
+    options = CacheOptions.from_config({**DEFAULTS, 'cache-max-memory-mb': 256, 'cache-ttl': 30})
+
+    assert options.environment('redis://redis:6379/0') == {
+        'DEMO_SERVER_CACHE_BACKEND': 'redis',
+        'DEMO_SERVER_CACHE_URL': 'redis://redis:6379/0',
+        'DEMO_SERVER_CACHE_EVICTION_POLICY': 'allkeys-lru',
+        'DEMO_SERVER_CACHE_MAX_MEMORY': str(256 * 2**20),
+        'DEMO_SERVER_CACHE_TTL': '30',
+    }
+
+
+def test_in_process_fallback():
+    options = CacheOptions.from_config({**DEFAULTS, 'cache-lru-size': 1024})
+
+    assert options.environment(None) == {
+        'DEMO_SERVER_CACHE_BACKEND': 'memory',
+        'DEMO_SERVER_CACHE_LRU_SIZE': '1024',
+        'DEMO_SERVER_CACHE_TTL': '60',
+    }
+    # Redis wins when it is related.
+    assert options.environment('redis://redis:6379/0')['DEMO_SERVER_CACHE_BACKEND'] == 'redis'
+
+
+@pytest.mark.parametrize(
+    'config,message',
+    [
+        ({'cache-ttl': -1}, 'cache-ttl'),
+        ({'cache-lru-size': -5}, 'cache-lru-size'),
+        ({'cache-eviction-policy': 'lru'}, 'cache-eviction-policy'),
+    ],
+)
+def test_invalid_options(config, message):
+    with pytest.raises(ValueError, match=message):
+        CacheOptions.from_config({**DEFAULTS, **config})
@@ -0,0 +1,19 @@
+from rolling_restart import REQUESTED, RESTARTED, grant
+
+
+def test_grants_up_to_max_concurrent_in_unit_order():
+    requests = {'app/10': REQUESTED, 'app/2': REQUESTED, 'app/1': REQUESTED}
+
+    assert grant(requests, [], max_concurrent=2) == ['app/1', 'app/2']
+
+
+def test_held_locks_are_kept_until_released():
+    requests = {'app/0': RESTARTED, 'app/1': REQUESTED}
+
+    assert grant(requests, ['app/0'], max_concurrent=1) == ['app/0']
+    # app/0 cleared its state, so the lock moves on.
+    assert grant({'app/1': REQUESTED}, ['app/0'], max_concurrent=1) == ['app/1']
+
+
+def test_grants_of_departed_units_are_dropped():
+    assert grant({'app/1': REQUESTED}, ['app/3'], max_concurrent=1) == ['app/1']
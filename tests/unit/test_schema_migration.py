@@ -0,0 +1,23 @@
+import schema_migration
+
+ENDPOINTS = '10.0.0.1:5432,10.0.0.2:5432'
+
+
+def test_migration_key_follows_command_and_database():
+    key = schema_migration.migration_key('alembic upgrade head', ENDPOINTS, 'names_db')
+
+    assert key == schema_migration.migration_key('alembic upgrade head', ENDPOINTS, 'names_db')
+    assert key != schema_migration.migration_key('alembic upgrade +1', ENDPOINTS, 'names_db')
+    assert key != schema_migration.migration_key('alembic upgrade head', '10.0.0.3:5', 'names_db')
+    assert key != schema_migration.migration_key('alembic upgrade head', ENDPOINTS, 'other_db')
+
+
+def test_parse_revision():
+    assert schema_migration.parse_revision('INFO upgrading\nae1027a6acf\n\n') == 'ae1027a6acf'
+    assert schema_migration.parse_revision('') == schema_migration.UNKNOWN_REVISION
+
+
+def test_warmed_up():
+    assert schema_migration.warmed_up({'requests': 20, 'errors': 0})
+    assert not schema_migration.warmed_up({'requests': 20, 'errors': 1})
+    assert not schema_migration.warmed_up({'requests': 0, 'errors': 0})
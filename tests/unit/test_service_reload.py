@@ -0,0 +1,44 @@
+import service_reload
+
+CURRENT = {
+    'override': 'replace',
+    'command': 'uvicorn api_demo_server.app:app --host=0.0.0.0 --port=8000 --workers=4',
+    'environment': {
+        'DEMO_SERVER_DB_PASSWORD': 'old',
+        'DEMO_SERVER_SETTINGS_FILE': service_reload.SETTINGS_FILE,
+    },
+}
+
+
+def test_database_setting_change_can_be_reloaded():
+    environment = {**CURRENT['environment'], 'DEMO_SERVER_DB_PASSWORD': 'new'}
+    desired = {**CURRENT, 'environment': environment}
+
+    assert service_reload.changed_fields(CURRENT, desired) == {
+        'environment.DEMO_SERVER_DB_PASSWORD'
+    }
+    assert service_reload.can_reload(CURRENT, desired)
+
+
+def test_command_change_needs_restart():
+    desired = {**CURRENT, 'command': CURRENT['command'] + ' --loop=uvloop'}
+
+    assert not service_reload.can_reload(CURRENT, desired)
+
+
+def test_new_service_needs_restart():
+    assert not service_reload.can_reload({}, CURRENT)
+
+
+def test_render_settings_only_includes_database_settings():
+    rendered = service_reload.render_settings(
+        {
+            'DEMO_SERVER_DB_USER': 'foo',
+            'DEMO_SERVER_DB_PASSWORD': "it's secret",
+            'DEMO_SERVER_SETTINGS_FILE': service_reload.SETTINGS_FILE,
+        }
+    )
+
+    assert rendered == (
+        'DEMO_SERVER_DB_PASSWORD=\'it\'"\'"\'s secret\'\nDEMO_SERVER_DB_USER=foo\n'
+    )
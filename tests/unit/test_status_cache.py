@@ -0,0 +1,39 @@
+import status_cache
+from status_cache import StatusSnapshot
+
+
+def test_fingerprint_is_stable():
+    inputs = {'config': {'server-port': 8000}, 'checks': {'fastapi-live': 'up'}}
+
+    assert status_cache.fingerprint(inputs) == status_cache.fingerprint(dict(reversed(inputs.items())))
+    assert status_cache.fingerprint(inputs) != status_cache.fingerprint(
+        {**inputs, 'checks': {'fastapi-live': 'down'}}
+    )
+
+
+def test_snapshot_round_trip():
+    snapshot = StatusSnapshot(name='active', message='', fingerprint='abc', evaluated_at=100.0)
+
+    assert StatusSnapshot.from_json(snapshot.to_json()) == snapshot
+    assert StatusSnapshot.from_json('') is None
+
+
+def test_fresh():
+    snapshot = StatusSnapshot(name='waiting', message='', fingerprint='abc', evaluated_at=100.0)
+
+    assert snapshot.fresh(now=200.0, interval=1800)
+    assert not snapshot.fresh(now=1900.0, interval=1800)
+    assert not snapshot.fresh(now=200.0, interval=0)
+
+
+def test_reusable():
+    snapshot = StatusSnapshot(name='active', message='', fingerprint='abc', evaluated_at=100.0)
+
+    assert snapshot.reusable('abc', now=200.0, interval=1800)
+    assert not snapshot.reusable('def', now=200.0, interval=1800)
+    # A full evaluation is due after the interval, or if the clock went backwards.
+    assert not snapshot.reusable('abc', now=1900.0, interval=1800)
+    assert not snapshot.reusable('abc', now=50.0, interval=1800)
+    assert not snapshot.reusable('abc', now=200.0, interval=0)
+    waiting = StatusSnapshot(name='waiting', message='', fingerprint='abc', evaluated_at=100.0)
+    assert not waiting.reusable('abc', now=200.0, interval=1800)
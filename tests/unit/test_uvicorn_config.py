@@ -0,0 +1,64 @@
+import pytest
+
+import uvicorn_config
+from uvicorn_config import UvicornOptions
+
+DEFAULT_CONFIG = {
+    'workers': '1',
+    'loop': 'auto',
+    'http': 'auto',
+    'backlog': 2048,
+    'timeout-keep-alive': 5,
+    'limit-concurrency': 0,
+}
+
+
+def test_defaults_render_no_extra_arguments():
+    assert UvicornOptions.from_config(DEFAULT_CONFIG).args() == []
+
+
+def test_tuned_options_are_rendered():
+    config = {
+        **DEFAULT_CONFIG,
+        'workers': '4',
+        'loop': 'uvloop',
+        'http': 'httptools',
+        'backlog': 4096,
+        'limit-concurrency': 100,
+    }
+
+    assert UvicornOptions.from_config(config).args() == [
+        '--workers=4',
+        '--loop=uvloop',
+        '--http=httptools',
+        '--backlog=4096',
+        '--limit-concurrency=100',
+    ]
+
+
+def test_auto_workers_follow_cpu_limit():
+    options = UvicornOptions.from_config({**DEFAULT_CONFIG, 'workers': 'auto'})
+
+    assert options.workers is None
+    assert options.args(cpu_limit=2.5) == ['--workers=2']
+    assert options.args(cpu_limit=0.5) == []
+
+
+@pytest.mark.parametrize(
+    'key,value',
+    [('workers', '0'), ('workers', 'many'), ('loop', 'trio'), ('http', 'h2'), ('backlog', 0)],
+)
+def test_invalid_options_raise(key, value):
+    with pytest.raises(ValueError):
+        UvicornOptions.from_config({**DEFAULT_CONFIG, key: value})
+
+
+@pytest.mark.parametrize(
+    'content,expected', [('max 100000\n', None), ('200000 100000\n', 2.0), ('50000 100000', 0.5)]
+)
+def test_parse_cpu_max(content, expected):
+    assert uvicorn_config.parse_cpu_max(content) == expected
+
+
+def test_parse_cfs_quota_unlimited():
+    assert uvicorn_config.parse_cfs_quota('-1', '100000') is None
@@ -0,0 +1,83 @@
+import pytest
+
+import worker_recycling
+from worker_recycling import RecycleOptions
+
+DEFAULTS = {
+    'max-requests': 0,
+    'max-requests-jitter': 0,
+    'memory-recycle-threshold-mb': 0,
+    'backoff-delay': 0,
+    'backoff-factor': 0.0,
+    'backoff-limit': 0,
+}
+
+
+def test_defaults_add_nothing():
+    options = RecycleOptions.from_config(DEFAULTS)
+
+    assert options.uvicorn_args('demo-api-charm/0') == []
+    assert options.service_fields() == {}
+    assert not options.over_threshold(10 * 2**30)
+
+
+def test_max_requests_jitter_is_stable_per_unit():
+    options = RecycleOptions.from_config({**DEFAULTS, 'max-requests': 1000, 'max-requests-jitter': 100})
+    limits = {
+        unit: int(options.uvicorn_args(unit)[0].split('=')[1])
+        for unit in (f'demo-api-charm/{n}' for n in range(10))
+    }
+
+    assert all(1000 <= limit <= 1100 for limit in limits.values())
+    assert len(set(limits.values())) > 1
+    assert options.uvicorn_args('demo-api-charm/3') == [
+        f"--limit-max-requests={limits['demo-api-charm/3']}"
+    ]
+    no_jitter = RecycleOptions.from_config({**DEFAULTS, 'max-requests': 1000})
+    assert no_jitter.uvicorn_args('demo-api-charm/3') == ['--limit-max-requests=1000']
+
+
+def test_backoff_service_fields():
+    options = RecycleOptions.from_config(
+        {**DEFAULTS, 'backoff-delay': 2, 'backoff-factor': 1.5, 'backoff-limit': 60}
+    )
+
+    assert options.service_fields() == {
+        'backoff-delay': '2s',
+        'backoff-factor': 1.5,
+        'backoff-limit': '1m0s',
+    }
+
+
+def test_parse_memory_stat():
+    assert worker_recycling.parse_memory_stat('anon 1048576\nfile 4096\n') == 1048576
+    assert worker_recycling.parse_memory_stat('cache 4096\ntotal_rss 2048\nrss 1024\n') == 2048
+    assert worker_recycling.parse_memory_stat('cache 4096\n') is None
+
+
+def test_over_threshold():
+    options = RecycleOptions.from_config({**DEFAULTS, 'memory-recycle-threshold-mb': 512})
+
+    assert options.over_threshold(513 * 2**20)
+    assert not options.over_threshold(512 * 2**20)
+    assert not options.over_threshold(None)
+
+
+def test_describe():
+    assert worker_recycling.describe({}) is None
+    assert worker_recycling.describe({'count': 2, 'last_rss': 600 * 2**20}) == (
+        '2 memory recycle(s), last at 600 MiB'
+    )
+
+
+@pytest.mark.parametrize(
+    'config,message',
+    [
+        ({'max-requests': -1}, 'max-requests'),
+        ({'memory-recycle-threshold-mb': -512}, 'memory-recycle-threshold-mb'),
+        ({'backoff-factor': 0.5}, 'backoff-factor'),
+    ],
+)
+def test_invalid_options(config, message):
+    with pytest.raises(ValueError, match=message):
+        RecycleOptions.from_config({**DEFAULTS, **config})
@@ -0,0 +1,103 @@
+import pytest
+
+import workload_logging
+from workload_logging import LoggingOptions
+
+DEFAULTS = {
+    'log-level': 'info',
+    'log-destination': 'file',
+    'log-max-mb': 10,
+    'log-backup-count': 3,
+    'access-log': True,
+}
+
+
+def test_defaults_add_nothing():
+    options = LoggingOptions.from_config(DEFAULTS)
+
+    assert options == LoggingOptions()
+    assert options.log_file == workload_logging.DEFAULT_LOG_FILE
+    assert options.environment == {}
+    assert options.uvicorn_args() == []
+
+
+def test_rotated_file_on_storage():
+    options = LoggingOptions.from_config(
+        {**DEFAULTS, 'log-level': 'WARNING', 'log-destination': 'storage', 'log-max-mb': 5}
+    )
+
+    assert options.log_file == workload_logging.STORAGE_LOG_FILE
+    assert options.environment == {
+        'DEMO_SERVER_LOG_LEVEL': 'WARNING',
+        'DEMO_SERVER_LOG_FILE': workload_logging.STORAGE_LOG_FILE,
+        'DEMO_SERVER_LOG_MAX_BYTES': str(5 * 2**20),
+        'DEMO_SERVER_LOG_BACKUP_COUNT': '3',
+    }
+    assert options.uvicorn_args() == ['--log-level=warning']
+
+
+def test_storage_destination_without_storage_falls_back_to_file():
+    options = LoggingOptions.from_config(
+        {**DEFAULTS, 'log-destination': 'storage'}, storage_attached=False
+    )
+
+    assert options.log_file == workload_logging.DEFAULT_LOG_FILE
+    assert options.environment == {}
+
+
+def test_file_logging_off():
+    options = LoggingOptions.from_config({**DEFAULTS, 'log-destination': 'off', 'access-log': False})
+
+    assert options.log_file is None
+    assert options.environment == {'DEMO_SERVER_LOG_FILE': ''}
+    assert options.uvicorn_args() == ['--no-access-log']
+
+
+@pytest.mark.parametrize(
+    'config,message',
+    [
+        ({'log-level': 'verbose'}, 'log-level'),
+        ({'log-destination': 'tmp'}, 'log-destination'),
+        ({'log-max-mb': 0}, 'log-max-mb'),
+        ({'log-backup-count': -1}, 'log-backup-count'),
+    ],
+)
+def test_invalid_options(config, message):
+    with pytest.raises(ValueError, match=message):
+        LoggingOptions.from_config({**DEFAULTS, **config})
+
+
+def test_log_targets():
+    targets = workload_logging.log_targets(
+        ['http://b/push', 'http://a/push'], ['fastapi-service'], {'juju_unit': 'demo/0'}
+    )
+
+    assert targets == {
+        'loki-0': {
+            'override': 'replace',
+            'type': 'loki',
+            'location': 'http://a/push',
+            'services': ['fastapi-service'],
+            'labels': {'juju_unit': 'demo/0'},
+        },
+        'loki-1': {
+            'override': 'replace',
+            'type': 'loki',
+            'location': 'http://b/push',
+            'services': ['fastapi-service'],
+            'labels': {'juju_unit': 'demo/0'},
+        },
+    }
+
+
+def test_stale_log_targets_are_disabled_once():
+    current = {
+        'loki-0': {'services': ['fastapi-service']},
+        'loki-1': {'services': ['fastapi-service']},
+        'loki-2': {'services': ['-all']},
+        'other': {'services': ['fastapi-service']},
+    }
+
+    assert workload_logging.stale_log_targets(current, {'loki-0': {}}) == {
+        'loki-1': {'override': 'merge', 'services': ['-all']}
+    }
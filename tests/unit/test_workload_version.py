@@ -0,0 +1,44 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+import workload_version
+from workload_version import VersionProbe
+
+
+@pytest.fixture
+def sleep():
+    return Mock()
+
+
+def test_probe_waits_for_service_then_returns_version(monkeypatch, sleep):
+    response = Mock()
+    response.json.return_value = {'version': '1.0.1'}
+    get = Mock(return_value=response)
+    monkeypatch.setattr(requests, 'get', get)
+    probe = VersionProbe(8000, is_ready=Mock(side_effect=[False, True]), sleep=sleep)
+
+    assert probe.probe() == '1.0.1'
+    get.assert_called_once_with(
+        'http://localhost:8000/version',
+        timeout=(workload_version.CONNECT_TIMEOUT, workload_version.READ_TIMEOUT),
+    )
+    sleep.assert_called_once_with(workload_version.RETRY_DELAYS[0])
+
+
+def test_probe_gives_up_after_bounded_retries(monkeypatch, sleep):
+    get = Mock(side_effect=requests.ConnectionError('connection refused'))
+    monkeypatch.setattr(requests, 'get', get)
+    probe = VersionProbe(8000, is_ready=lambda: True, sleep=sleep)
+
+    assert probe.probe() is None
+    assert get.call_count == len(workload_version.RETRY_DELAYS) + 1
+
+
+def test_fingerprint_ignores_key_order():
+    a = {'fastapi-service': {'command': 'uvicorn', 'environment': {'A': '1', 'B': '2'}}}
+    b = {'fastapi-service': {'environment': {'B': '2', 'A': '1'}, 'command': 'uvicorn'}}
+
+    assert workload_version.fingerprint(a) == workload_version.fingerprint(b)
+    assert workload_version.fingerprint(a) != workload_version.fingerprint({})